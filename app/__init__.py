@@ -4,7 +4,14 @@ from logging.handlers import RotatingFileHandler
 from flask import Flask
 from .config import Config
 
-def create_app():
+def create_app(warmup_in_background=None):
+    """
+    Create the Flask app.
+
+    Heavy libraries are not imported here. When warmup_in_background is true
+    (default: Config.WARMUP_IN_BACKGROUND) they are loaded by a background
+    thread so the first summarization does not pay for them.
+    """
     app = Flask(__name__)
     app.config.from_object(Config)
     
@@ -18,6 +25,20 @@ def create_app():
     from .routes import main_bp
     app.register_blueprint(main_bp)
 
+    # 4. Measure cold start to the first served request of each process
+    from . import warmup
+
+    @app.after_request
+    def record_first_request(response):
+        warmup.record_first_request()
+        return response
+
+    # 5. Load heavy subsystems without blocking startup
+    if warmup_in_background is None:
+        warmup_in_background = Config.WARMUP_IN_BACKGROUND
+    if warmup_in_background:
+        warmup.start_worker_warmup()
+
     app.logger.info("Application initialized successfully")
     return app
 
@@ -25,7 +46,6 @@ def create_required_directories(app):
     """Create all necessary directories first"""
     required_dirs = [
         app.config['UPLOAD_FOLDER'],
-        app.config['VECTOR_STORE_DIR'],
         app.config['OUTPUT_DIR'],
         os.path.join(app.instance_path, 'logs')  # Add logs directory
     ]
@@ -6,11 +6,80 @@ load_dotenv()
 class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     UPLOAD_FOLDER = 'instance/uploads'
-    VECTOR_STORE_DIR = 'instance/uploads/vector_store'
     OUTPUT_DIR = 'instance/output'
+    # Each request gets UPLOAD_FOLDER/<job_id> and OUTPUT_DIR/<job_id>; older jobs are removed
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(24 * 60 * 60)))
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    # FAISS vector encoding: flat (float32), fp16, sq8 (8-bit scalar) or pq (product quantizer)
+    VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'flat')
+    PQ_SUBQUANTIZERS = int(os.getenv('PQ_SUBQUANTIZERS', '48'))
+    HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', '64'))
+    # PDF text extraction processes per web worker (1 = serial) and pages per extraction task
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', str(min(os.cpu_count() or 1, 4))))
+    INGEST_PAGES_PER_TASK = int(os.getenv('INGEST_PAGES_PER_TASK', '25'))
+    # Production server (serve.py)
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '2'))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '900'))
+    # Load the embedding model and heavy imports in the master before forking workers
+    WEB_PRELOAD = os.getenv('WEB_PRELOAD', '1') == '1'
+    # Import heavy libraries and load models in a background thread after create_app()
+    WARMUP_IN_BACKGROUND = os.getenv('WARMUP_IN_BACKGROUND', '1') == '1'
+    RENDER_CACHE_DIR = 'instance/cache/renders'
+    # With ALLOW_PROFILING=1, jobs uploaded with an "X-Profile: 1" header or ?profile=1 save a
+    # span tree, a cProfile and sampled folded stacks next to their outputs. Off by default:
+    # anyone who can upload could otherwise profile a production worker (run.py enables it)
+    ALLOW_PROFILING = os.getenv('ALLOW_PROFILING', '0') == '1'
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
     ALLOWED_EXTENSIONS = {'pdf'}
+    MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(50 * 1024 * 1024)))
+    # Whole request body; larger uploads are rejected before any data is read
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(500 * 1024 * 1024)))
     LOG_LEVEL = 'DEBUG'  
     LOG_FILE = 'app.log'
+    # LLM backend: "openai", "openai_compatible" (local server at LLM_BASE_URL)
+    # or "llamacpp" (in-process CPU inference from the GGUF file at LLM_MODEL_PATH);
+    # "echo" is an offline fake for load tests
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'openai')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4')
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://localhost:8080/v1')
+    LLM_API_KEY = os.getenv('LLM_API_KEY', 'not-needed')
+    LLM_MODEL_PATH = os.getenv('LLM_MODEL_PATH', 'instance/models/model.gguf')
+    # Seconds the offline "echo" backend (load tests) waits per call
+    LLM_ECHO_DELAY = float(os.getenv('LLM_ECHO_DELAY', '0'))
+    LLM_THREADS = int(os.getenv('LLM_THREADS', str(os.cpu_count() or 4)))
+    LLM_CONTEXT_SIZE = int(os.getenv('LLM_CONTEXT_SIZE', '8192'))
+    # Section prompts kept in flight at once; servers with continuous batching schedule them together
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '6'))
+    SECTION_TOP_K = int(os.getenv('SECTION_TOP_K', '2'))
+    # "retrieval" (top-k context per section) or "map_reduce" (every chunk, for very long filings)
+    SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'retrieval')
+    MAP_REDUCE_MODEL = os.getenv('MAP_REDUCE_MODEL', 'gpt-3.5-turbo')
+    MAP_REDUCE_WORKERS = int(os.getenv('MAP_REDUCE_WORKERS', '4'))
+    MAP_SUMMARY_CACHE_DIR = 'instance/cache/map_summaries'
+    # Model tiers, smallest first, and the routing table mapping prompts to tier chains:
+    # sections up to 100 words start on the fast tier and escalate when validation fails.
+    # Unset: fast=MAP_REDUCE_MODEL,standard=LLM_MODEL on openai; local backends serve one
+    # model, so both tiers use LLM_MODEL (and are merged). Resolved when a router is created
+    MODEL_TIERS = os.getenv('MODEL_TIERS', '')
+    MODEL_ROUTING_TABLE = os.getenv(
+        'MODEL_ROUTING_TABLE',
+        '[{"max_words": 100, "complexity": "normal", "tiers": ["fast", "standard"]}, {"tiers": ["standard"]}]'
+    )
+    # JSON object of section name (or "one_page_summary") -> tier chain, e.g. {"swot_analysis": ["fast", "standard"]}
+    MODEL_ROUTE_OVERRIDES = os.getenv('MODEL_ROUTE_OVERRIDES', '{}')
+    # Fast-tier answers longer than word_limit * (1 + tolerance) are escalated
+    ROUTER_LENGTH_TOLERANCE = float(os.getenv('ROUTER_LENGTH_TOLERANCE', '0.2'))
+    ROUTING_LOG_PATH = 'instance/logs/model_routing.jsonl'
+    # Section summaries keyed by retrieved chunks + prompt version; unchanged sections are reused
+    SECTION_CACHE_DIR = 'instance/cache/sections'
+    # Section and map summaries unused for this long are removed by the job cleanup
+    SUMMARY_CACHE_MAX_AGE_SECONDS = int(os.getenv('SUMMARY_CACHE_MAX_AGE_SECONDS', str(7 * 24 * 60 * 60)))
+    # SQLite LRU caches of query embeddings and of retrieved node IDs per index version
+    QUERY_CACHE_PATH = 'instance/cache/queries.sqlite3'
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '10000'))
+    RETRIEVAL_CACHE_SIZE = int(os.getenv('RETRIEVAL_CACHE_SIZE', '10000'))
     GROUND_TRUTH = [
         {
             "question": "How much revenue did Apple generate from Services in Q2 2023?",
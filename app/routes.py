@@ -6,50 +6,54 @@ from flask import (
     request, 
     jsonify, 
     send_from_directory,
+    send_file,
     url_for
 )
-from docx import Document
+import re
+import json
+import time
+import uuid
 from app.config import Config
-from app.services.financial_processor import FinancialDocumentProcessor
-from app.services.raga_evaluator import RagaEvaluator
+from app import warmup
+from app.services.report_renderer import ReportRenderer, MIMETYPES, SUMMARIES_FILE
+from app.services.summary_cache import SummaryCache
 from app.utils.file_handler import FileHandler
+from app.utils.job_status import read_status
+from app.utils.profiling import PROFILE_FILES
 import shutil
 
 main_bp = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
 
-file_handler = FileHandler(
-    upload_folder=Config.UPLOAD_FOLDER,
-    allowed_extensions=Config.ALLOWED_EXTENSIONS
-)
+report_renderer = ReportRenderer(Config.RENDER_CACHE_DIR)
+SUMMARY_NAMES = {'one_page_summary', 'two_page_summary'}
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+TRUTHY = {'1', 'true', 'yes', 'on'}
+
+
+def job_dirs(job_id):
+    """Upload and output directories of one summarization job"""
+    return (os.path.join(Config.UPLOAD_FOLDER, job_id),
+            os.path.join(Config.OUTPUT_DIR, job_id))
+
+
 def cleanup_system():
-    """Clean all working directories and pycache"""
+    """Remove expired job directories and summary cache entries"""
     try:
-        # Clean uploads directory
-        if os.path.exists(Config.UPLOAD_FOLDER):
-            shutil.rmtree(Config.UPLOAD_FOLDER)
-            os.makedirs(Config.UPLOAD_FOLDER)
-            logger.info(f"Cleaned uploads directory: {Config.UPLOAD_FOLDER}")
-
-        # Clean output directory
-        if os.path.exists(Config.OUTPUT_DIR):
-            shutil.rmtree(Config.OUTPUT_DIR)
-            os.makedirs(Config.OUTPUT_DIR)
-            logger.info(f"Cleaned output directory: {Config.OUTPUT_DIR}")
-
-        # Clean vector store
-        if os.path.exists(Config.VECTOR_STORE_DIR):
-            shutil.rmtree(Config.VECTOR_STORE_DIR)
-            os.makedirs(Config.VECTOR_STORE_DIR)
-            logger.info(f"Cleaned vector store: {Config.VECTOR_STORE_DIR}")
-
-        # Remove all __pycache__ directories
-        for root, dirs, files in os.walk(os.getcwd()):
-            for dir_name in dirs:
-                if dir_name == "__pycache__":
-                    pycache_path = os.path.join(root, dir_name)
-                    shutil.rmtree(pycache_path)
-                    logger.info(f"Removed pycache: {pycache_path}")
+        # Each request works in its own job directories, so only expired jobs are removed;
+        # wiping everything would delete the files of requests still running in other workers
+        cutoff = time.time() - Config.JOB_RETENTION_SECONDS
+        for base_dir in (Config.UPLOAD_FOLDER, Config.OUTPUT_DIR):
+            if not os.path.exists(base_dir):
+                continue
+            for job_id in os.listdir(base_dir):
+                job_path = os.path.join(base_dir, job_id)
+                if JOB_ID_PATTERN.match(job_id) and os.path.getmtime(job_path) < cutoff:
+                    shutil.rmtree(job_path, ignore_errors=True)
+                    logger.info(f"Removed expired job directory: {job_path}")
+
+        for cache_dir in (Config.SECTION_CACHE_DIR, Config.MAP_SUMMARY_CACHE_DIR):
+            SummaryCache(cache_dir).prune(Config.SUMMARY_CACHE_MAX_AGE_SECONDS)
 
     except Exception as e:
         logger.error(f"Cleanup failed: {str(e)}")
@@ -61,45 +65,81 @@ def index():
         if request.method == 'POST':
             cleanup_system()
             
-            files = request.files.getlist('files')
-            
-            if not any(f.filename != '' for f in files):
+            # Reject oversized bodies before reading anything
+            if request.content_length and request.content_length > Config.MAX_CONTENT_LENGTH:
+                return render_template('error.html', error="Upload too large"), 413
+
+            boundary = request.mimetype_params.get('boundary')
+            if request.mimetype != 'multipart/form-data' or not boundary:
                 return render_template('error.html', error="No files selected")
 
-            saved_files = file_handler.save_uploaded_files(files)
+            # Clients may choose the job id (X-Job-Id) so they can poll /status/<job_id>
+            # while the request runs; it must be a new 32-character hex id
+            job_id = request.headers.get('X-Job-Id', '').lower() or uuid.uuid4().hex
+            if not JOB_ID_PATTERN.match(job_id):
+                return jsonify({'success': False, 'error': 'Invalid job id'}), 400
+            upload_dir, output_dir = job_dirs(job_id)
+            try:
+                os.makedirs(output_dir)
+            except FileExistsError:
+                return jsonify({'success': False, 'error': 'Job id already in use'}), 409
+
+            file_handler = FileHandler(
+                upload_folder=upload_dir,
+                allowed_extensions=Config.ALLOWED_EXTENSIONS,
+                max_file_size=Config.MAX_FILE_SIZE
+            )
+
+            # Stream files straight to disk instead of letting Werkzeug buffer the whole body
+            saved_files = file_handler.save_streamed_files(request.stream, boundary.encode('latin-1'))
             
             if not saved_files:
                 return render_template('error.html', error="Invalid file(s)")
 
+            # Opt-in profiling, per request (header) or per job (?profile=1)
+            profile = Config.ALLOW_PROFILING and (
+                request.headers.get('X-Profile', '').lower() in TRUTHY
+                or request.args.get('profile', '').lower() in TRUTHY
+            )
+
+            # Heavy imports (torch, llama_index, faiss, langchain) load on first use,
+            # or earlier from the background warm-up
+            from app.services.financial_processor import FinancialDocumentProcessor
+
             processor = FinancialDocumentProcessor(
-                Config.UPLOAD_FOLDER,
-                Config.OUTPUT_DIR,
-                Config.OPENAI_API_KEY
+                upload_dir,
+                output_dir,
+                Config.OPENAI_API_KEY,
+                summary_mode=Config.SUMMARY_MODE,
+                file_hashes={os.path.basename(f.path): f.sha256 for f in saved_files},
+                profile=profile
             )
             
             if processor.process_documents():
-                # Generate preview
+                # Preview straight from the in-memory one-page summary
                 preview_content = "Preview unavailable"
-                one_page_path = os.path.join(Config.OUTPUT_DIR, 'one_page_summary.docx')
-                
-                try:
-                    if os.path.exists(one_page_path):
-                        doc = Document(one_page_path)
-                        paragraphs = [para.text.strip() for para in doc.paragraphs if para.text.strip()]
-                        preview_content = '\n\n'.join(paragraphs) or "Preview content empty"
-                        logger.info(f"Generated preview from {one_page_path}")
-                except Exception as e:
-                    logger.error(f"Preview error: {str(e)}", exc_info=True)
-
-                return jsonify({
+                if processor.one_page_summary is not None:
+                    preview_content = processor.one_page_summary.strip() or "Preview content empty"
+
+                result = {
                     'success': True,
+                    'job_id': job_id,
                     'preview': preview_content,
                     'downloads': {
-                        'one_page': url_for('main.download_file', filename='one_page_summary.docx'),
-                        'two_page': url_for('main.download_file', filename='two_page_summary.docx')
+                        'one_page': url_for('main.download_file', job_id=job_id, filename='one_page_summary.docx'),
+                        'two_page': url_for('main.download_file', job_id=job_id, filename='two_page_summary.docx')
+                    },
+                    'evaluate': url_for('main.evaluate_rag', job_id=job_id)
+                }
+                if profile:
+                    result['profile'] = {
+                        name: url_for('main.download_file', job_id=job_id, filename=name)
+                        for name in PROFILE_FILES if os.path.exists(os.path.join(output_dir, name))
                     }
-                })
+                return jsonify(result)
 
+            if processor.error:
+                return jsonify({'success': False, 'error': processor.error}), 422
             return jsonify({'success': False, 'error': 'Processing failed'})
         
         # GET request
@@ -109,19 +149,45 @@ def index():
         logger.error(f"Main route error: {str(e)}", exc_info=True)
         return render_template('error.html', error=str(e))
 
-@main_bp.route('/download/<filename>')
-def download_file(filename):
+@main_bp.route('/download/<job_id>/<filename>')
+def download_file(job_id, filename):
     try:
-        allowed_files = {'one_page_summary.docx', 'two_page_summary.docx'}
-        
-        if filename not in allowed_files:
+        name, _, fmt = filename.rpartition('.')
+        if not JOB_ID_PATTERN.match(job_id):
             return jsonify({'error': 'Invalid filename'}), 400
-            
-        return send_from_directory(
-            directory=os.path.abspath(Config.OUTPUT_DIR),
-            path=filename,
+
+        _, output_dir = job_dirs(job_id)
+        if filename in PROFILE_FILES:
+            # Folded stacks (flamegraph.pl, speedscope), cProfile stats or the span tree
+            return send_from_directory(
+                directory=os.path.abspath(output_dir),
+                path=filename,
+                as_attachment=True
+            )
+
+        if name not in SUMMARY_NAMES or fmt not in MIMETYPES:
+            return jsonify({'error': 'Invalid filename'}), 400
+
+        if fmt == 'docx':
+            return send_from_directory(
+                directory=os.path.abspath(output_dir),
+                path=filename,
+                as_attachment=True,
+                mimetype=MIMETYPES['docx']
+            )
+
+        # Other formats are rendered on first download and cached by content hash
+        with open(os.path.join(output_dir, SUMMARIES_FILE), 'r', encoding='utf-8') as f:
+            summaries = json.load(f)
+        if name not in summaries['summaries']:
+            raise FileNotFoundError(filename)
+
+        path = report_renderer.get_path(summaries['summaries'][name], summaries['generated_on'], fmt)
+        return send_file(
+            os.path.abspath(path),
             as_attachment=True,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            download_name=filename,
+            mimetype=MIMETYPES[fmt]
         )
     except FileNotFoundError:
         logger.error(f"File not found: {filename}")
@@ -130,13 +196,24 @@ def download_file(filename):
         logger.error(f"Download error: {str(e)}")
         return jsonify({'error': 'Download failed'}), 500
     
-@main_bp.route('/evaluate', methods=['GET'])
-def evaluate_rag():
+@main_bp.route('/evaluate/<job_id>', methods=['GET'])
+def evaluate_rag(job_id):
     try:
+        if not JOB_ID_PATTERN.match(job_id):
+            return jsonify({'error': 'Invalid job'}), 400
+
+        upload_dir, _ = job_dirs(job_id)
+        vector_dir = os.path.join(upload_dir, 'vector_store')
+        if not os.path.isdir(vector_dir):
+            return jsonify({'error': 'Job not found'}), 404
+
+        # ragas, datasets and pandas are only needed here
+        from app.services.raga_evaluator import RagaEvaluator
+
         # Get ground truth questions and answers from config
 
         evaluator = RagaEvaluator(
-            vector_dir=Config.VECTOR_STORE_DIR,
+            vector_dir=vector_dir,
             ground_truth=Config.GROUND_TRUTH,
             openai_api_key=Config.OPENAI_API_KEY
         )
@@ -154,4 +231,24 @@ def evaluate_rag():
 
     except Exception as e:
         logger.error(f"RAG evaluation failed: {str(e)}", exc_info=True)
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/status/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Stage and per-file extraction progress of a job, for polling while it runs"""
+    if not JOB_ID_PATTERN.match(job_id):
+        return jsonify({'error': 'Invalid job'}), 400
+
+    _, output_dir = job_dirs(job_id)
+    state = read_status(output_dir)
+    if state is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(state)
+
+
+@main_bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once models are warm (or loading lazily), 503 while warming up"""
+    state = warmup.status()
+    return jsonify(state), 200 if warmup.is_ready() else 503
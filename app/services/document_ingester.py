@@ -1,83 +1,270 @@
 import os
 import logging
-from typing import List
+import mimetypes
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
 from llama_index.core import (
     VectorStoreIndex,
-    SimpleDirectoryReader,
-    Settings
+    Document,
+    StorageContext,
+    Settings,
+    load_index_from_storage
 )
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.schema import MetadataMode
 from llama_index.vector_stores.faiss import FaissVectorStore
 from llama_index.core.node_parser import SimpleNodeParser
-import faiss
+from app.config import Config
+from app.utils.profiling import span
+from .embeddings import get_embed_model
+from .vector_index import create_faiss_index, index_size_bytes
+from .pdf_extraction import PageRange, plan_tasks, extract_parallel
+from .summary_cache import SummaryCache, content_hash
 
 logger = logging.getLogger(__name__)
 
+# SimpleDirectoryReader's exclusions plus the upload path, which names the job directory:
+# the same filing uploaded in another job embeds identically and keeps its index version
+EXCLUDED_FILE_METADATA = ["file_name", "file_path", "file_type", "file_size", "creation_date",
+                          "last_modified_date", "last_accessed_date", "file_sha256"]
+
+# Fingerprint of the indexed content and search settings, persisted next to the index;
+# cached retrievals are only reused for the same version
+INDEX_VERSION_FILE = "index_version"
+
+NO_TEXT_ERROR = "No extractable text in uploaded documents (scanned PDFs need OCR first)"
+
+
+class NoExtractableTextError(ValueError):
+    """The uploaded PDFs contain no text to index, e.g. scans without a text layer"""
+
+
+def _node_id(i: int, document: Document) -> str:
+    """Deterministic node ID: the i-th chunk of a page keeps its ID across re-ingests"""
+    return f"{document.id_}-n{i}"
+
+
 class DocumentIngester:
     def __init__(self, input_dir: str, vector_dir: str,
-                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+                 embedding_model: str = Config.EMBEDDING_MODEL,
+                 file_hashes: Optional[Dict[str, str]] = None,
+                 index_type: str = Config.VECTOR_INDEX_TYPE,
+                 workers: int = Config.INGEST_WORKERS,
+                 pages_per_task: int = Config.INGEST_PAGES_PER_TASK,
+                 progress_callback: Optional[Callable[[str, int, int], None]] = None):
         self.input_dir = input_dir
         self.vector_dir = vector_dir
         self.embedding_model = embedding_model
+        # SHA-256 per uploaded file name, computed while streaming the upload
+        self.file_hashes = file_hashes or {}
+        # Vector encoding in FAISS: flat (float32), fp16, sq8 or pq
+        self.index_type = index_type
+        # PDF text extraction runs in a process pool, pages_per_task pages per task
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        # Called with (file_name, pages_done, pages_total) as extraction progresses
+        self.progress_callback = progress_callback
         self.index = None
+        self.index_version = None
         self.doc_count = 0
         self.node_count = 0
 
         # Configure global settings
-        Settings.embed_model = HuggingFaceEmbedding(model_name=self.embedding_model)
+        Settings.embed_model = get_embed_model(self.embedding_model)
         Settings.chunk_size = 512
         Settings.chunk_overlap = 50
 
     def load_documents(self) -> List:
         """Load PDFs from existing input directory"""
-        logger.info(f"Loading documents from {self.input_dir}")
+        return [document for _, batch in self.iter_documents() for document in batch]
+
+    def iter_documents(self) -> Iterator:
+        """
+        Extract PDF pages across a process pool, yielding each task's pages as they finish.
+
+        Returns:
+            Iterator of (task index, documents); task indexes follow file and page order
+        """
+        logger.info(f"Loading documents from {self.input_dir} with {self.workers} extraction workers")
         try:
             # Validate input directory exists
             if not os.path.exists(self.input_dir):
                 raise FileNotFoundError(f"Directory {self.input_dir} not found")
 
-            documents = SimpleDirectoryReader(self.input_dir).load_data()
-            self.doc_count = len(documents)
+            paths = sorted(
+                os.path.join(self.input_dir, name) for name in os.listdir(self.input_dir)
+                if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(self.input_dir, name))
+            )
+            if not paths:
+                raise ValueError(f"No files found in {self.input_dir}.")
+
+            tasks = plan_tasks(paths, self.pages_per_task)
+            pages_done = {path: 0 for path in paths}
+            self.doc_count = 0
+
+            extraction = extract_parallel(tasks, self.workers)
+            try:
+                for i, pages in extraction:
+                    task = tasks[i]
+                    documents = [self._page_document(task, task.start + offset, label, text)
+                                 for offset, (label, text) in enumerate(pages)]
+
+                    file_name = os.path.basename(task.path)
+                    pages_done[task.path] += len(pages)
+                    self.doc_count += len(documents)
+                    logger.info(f"Extracted {file_name} pages {task.start + 1}-{task.end} "
+                                f"({pages_done[task.path]}/{task.page_count})")
+                    if self.progress_callback:
+                        self.progress_callback(file_name, pages_done[task.path], task.page_count)
+
+                    yield i, documents
+            finally:
+                # Cancels queued extraction tasks when the caller stops early or fails
+                extraction.close()
+
             logger.info(f"Loaded {self.doc_count} documents")
-            return documents
         except Exception as e:
             logger.error(f"Document loading failed: {str(e)}")
             raise
 
-    def create_index(self, documents: List) -> VectorStoreIndex:
-        """Create FAISS index from documents"""
-        logger.info("Creating FAISS index")
-        try:
-            # Get embedding dimension from model
-            dimension =   384
+    def _page_document(self, task: PageRange, page: int, page_label: str, text: str) -> Document:
+        """One page as a Document, with the metadata SimpleDirectoryReader would attach"""
+        file_name = os.path.basename(task.path)
+        metadata = {
+            "page_label": page_label,
+            "file_name": file_name,
+            "file_path": task.path,
+            "file_type": mimetypes.guess_type(task.path)[0] or "application/pdf",
+            "file_size": os.path.getsize(task.path)
+        }
 
-            # Create vector store
-            faiss_index = faiss.IndexHNSWFlat(dimension, 32)
-            vector_store = FaissVectorStore(faiss_index=faiss_index)
+        # Tag pages with their file's upload hash so later stages can deduplicate by content
+        sha256 = self.file_hashes.get(file_name)
+        if sha256:
+            metadata["file_sha256"] = sha256
 
+        return Document(
+            # Stable across re-ingests of the same file, unlike the default random UUID
+            id_=f"{sha256 or file_name}-p{page}",
+            text=text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=list(EXCLUDED_FILE_METADATA),
+            excluded_llm_metadata_keys=list(EXCLUDED_FILE_METADATA)
+        )
+
+    def create_index(self, documents: Optional[List] = None) -> VectorStoreIndex:
+        """
+        Create FAISS index from documents.
+
+        Args:
+            documents: Documents to index; if omitted, PDFs are extracted in parallel and
+                each batch of pages is parsed and embedded as soon as it is extracted
+        """
+        logger.info(f"Creating FAISS index ({self.index_type} vectors)")
+        batches = None
+        try:
             # Parse and index documents
             node_parser = SimpleNodeParser.from_defaults(
                 chunk_size=512,
-                chunk_overlap=50
+                chunk_overlap=50,
+                id_func=_node_id
             )
-            nodes = node_parser.get_nodes_from_documents(documents)
 
-            # Create and persist index
-            index = VectorStoreIndex(
-                nodes,
-                vector_store=vector_store,
-                show_progress=True
+            batches = iter(self.iter_documents() if documents is None else [(0, documents)])
+            nodes_by_task = {}
+            while True:
+                with span("extract_wait"):
+                    item = next(batches, None)
+                if item is None:
+                    break
+                i, batch = item
+
+                with span("parse", task=i, pages=len(batch)):
+                    batch_nodes = node_parser.get_nodes_from_documents(batch)
+
+                # Embed up front: quantized indexes must be trained on the vectors before adding them
+                with span("embed", task=i, nodes=len(batch_nodes)):
+                    embeddings = Settings.embed_model.get_text_embedding_batch(
+                        [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch_nodes]
+                    )
+                for node, embedding in zip(batch_nodes, embeddings):
+                    node.embedding = embedding
+                nodes_by_task[i] = batch_nodes
+
+            # Back in file and page order, whatever order the extraction tasks finished in
+            nodes = [node for i in sorted(nodes_by_task) for node in nodes_by_task[i]]
+            if not nodes:
+                # e.g. scanned PDFs without a text layer
+                raise NoExtractableTextError(NO_TEXT_ERROR)
+            embeddings = [node.embedding for node in nodes]
+
+            # Create vector store
+            with span("train_index", index_type=self.index_type, vectors=len(embeddings)):
+                faiss_index = create_faiss_index(
+                    self.index_type,
+                    np.array(embeddings, dtype="float32"),
+                    pq_subquantizers=Config.PQ_SUBQUANTIZERS,
+                    ef_search=Config.HNSW_EF_SEARCH
+                )
+            vector_store = FaissVectorStore(faiss_index=faiss_index)
+            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+
+            # Create and persist index (nodes already carry embeddings, so none are recomputed)
+            with span("build_hnsw", nodes=len(nodes)):
+                index = VectorStoreIndex(
+                    nodes,
+                    storage_context=storage_context,
+                    show_progress=True
+                )
+
+            # Vectors live only in FAISS; make sure the JSON docstore holds text and metadata only
+            with_embeddings = [node for node in index.docstore.docs.values() if node.embedding is not None]
+            for node in with_embeddings:
+                node.embedding = None
+            if with_embeddings:
+                index.docstore.add_documents(with_embeddings, allow_update=True)
+
+            with span("persist_index"):
+                index.storage_context.persist(persist_dir=self.vector_dir)
+
+            self.index_version = SummaryCache.fingerprint(
+                self.embedding_model,
+                self.index_type,
+                str(Config.PQ_SUBQUANTIZERS),
+                str(Config.HNSW_EF_SEARCH),
+                [f"{node.node_id}:{content_hash(node.get_content(metadata_mode=MetadataMode.EMBED))}"
+                 for node in nodes]
             )
-            index.storage_context.persist(persist_dir=self.vector_dir)
+            with open(os.path.join(self.vector_dir, INDEX_VERSION_FILE), "w", encoding="utf-8") as f:
+                f.write(self.index_version)
             
             self.node_count = len(index.docstore.docs)
-            logger.info(f"Created index with {self.node_count} nodes")
+            logger.info(f"Created index with {self.node_count} nodes "
+                        f"({index_size_bytes(faiss_index) / max(self.node_count, 1):.0f} vector bytes/node)")
             return index
 
         except Exception as e:
             logger.error(f"Index creation failed: {str(e)}")
+            # Stop the extraction generator so its queued pool tasks are cancelled
+            if hasattr(batches, "close"):
+                batches.close()
             # Cleanup failed index
             if os.path.exists(self.vector_dir):
                 import shutil
                 shutil.rmtree(self.vector_dir)
-            raise
\ No newline at end of file
+            raise
+
+
+def load_persisted_index(vector_dir: str) -> VectorStoreIndex:
+    """Load an index written by DocumentIngester.create_index, whatever its vector encoding"""
+    vector_store = FaissVectorStore.from_persist_dir(vector_dir)
+    storage_context = StorageContext.from_defaults(vector_store=vector_store, persist_dir=vector_dir)
+    return load_index_from_storage(storage_context)
+
+
+def read_index_version(vector_dir: str) -> Optional[str]:
+    """Version written by DocumentIngester.create_index, or None for indexes built before versioning"""
+    try:
+        with open(os.path.join(vector_dir, INDEX_VERSION_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
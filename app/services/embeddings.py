@@ -0,0 +1,32 @@
+import logging
+import threading
+from typing import Dict
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+logger = logging.getLogger(__name__)
+
+# EMBEDDING_MODEL value for constant vectors without loading a model (offline load tests)
+MOCK_EMBEDDING_MODEL = "mock"
+MOCK_EMBEDDING_DIM = 384
+
+_models: Dict[str, BaseEmbedding] = {}
+_models_lock = threading.Lock()
+
+
+def get_embed_model(model_name: str) -> BaseEmbedding:
+    """
+    Return the process-wide embedding model, loading it on first use.
+
+    Loading in the master process before workers fork lets every worker
+    share the weights copy-on-write instead of loading its own copy.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            logger.info(f"Loading embedding model {model_name}")
+            if model_name == MOCK_EMBEDDING_MODEL:
+                _models[model_name] = MockEmbedding(embed_dim=MOCK_EMBEDDING_DIM, model_name=model_name)
+            else:
+                _models[model_name] = HuggingFaceEmbedding(model_name=model_name)
+        return _models[model_name]
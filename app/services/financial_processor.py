@@ -1,48 +1,89 @@
 import os
 import logging
-from .document_ingester import DocumentIngester
+from typing import Dict, Optional
+from app.config import Config
+from app.utils.job_status import JobStatus
+from app.utils.profiling import JobProfiler, span
+from .document_ingester import DocumentIngester, NoExtractableTextError
 from .summary_generator import SummaryGenerator
 
 logger = logging.getLogger(__name__)
 
 class FinancialDocumentProcessor:
-    def __init__(self, input_dir: str, output_dir: str, openai_api_key: str):
+    def __init__(self, input_dir: str, output_dir: str, openai_api_key: str,
+                 summary_mode: str = "retrieval", file_hashes: Optional[Dict[str, str]] = None,
+                 profile: bool = False):
         if not os.path.exists(input_dir):
             raise ValueError(f"Input directory {input_dir} not found")
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.vector_dir = os.path.join(input_dir, "vector_store")
         self.openai_api_key = openai_api_key
+        self.summary_mode = summary_mode
+        # Save a span tree, cProfile and sampled stacks of process_documents to output_dir
+        self.profile = profile
+        # Progress polled through GET /status/<job_id>
+        self.status = JobStatus(output_dir)
 
         # Ensure vector store directory exists
         os.makedirs(self.vector_dir, exist_ok=True)
 
         self.document_ingester = DocumentIngester(
             input_dir=self.input_dir,
-            vector_dir=self.vector_dir
+            vector_dir=self.vector_dir,
+            file_hashes=file_hashes,
+            progress_callback=self.status.file_progress
         )
         self.index = None
         self.summary_generator = None
+        self.run_stats = {}
+        self.one_page_summary = None
+        # Why processing failed, when it is a problem with the input the user can fix
+        self.error = None
 
     def process_documents(self) -> bool:
         """Process existing PDFs in input folder"""
+        if not self.profile:
+            return self._process_documents()
+
+        profiler = JobProfiler(self.output_dir, sample_interval=Config.PROFILE_SAMPLE_INTERVAL)
+        with profiler, span("process_documents", summary_mode=self.summary_mode):
+            processed = self._process_documents()
+        logger.info(f"Profile spans (seconds): {profiler.summary()}")
+        return processed
+
+    def _process_documents(self) -> bool:
         try:
-            # Load and index documents
-            documents = self.document_ingester.load_documents()
-            self.index = self.document_ingester.create_index(documents)
+            # Extract, parse and embed documents, streaming pages from the extraction workers
+            self.status.set_stage("ingesting")
+            with span("create_index"):
+                self.index = self.document_ingester.create_index()
+            self.status.set_stage("summarizing", pages=self.document_ingester.doc_count,
+                                  nodes=self.document_ingester.node_count)
 
             # Generate summaries
             self.summary_generator = SummaryGenerator(
                 self.index,
                 self.output_dir,
-                self.openai_api_key
+                self.openai_api_key,
+                mode=self.summary_mode,
+                index_version=self.document_ingester.index_version
             )
 
-            two_page = self.summary_generator.generate_two_page_summary()
-            self.summary_generator.generate_one_page_summary(two_page)
+            with span("generate_two_page_summary"):
+                two_page = self.summary_generator.generate_two_page_summary()
+            with span("generate_one_page_summary"):
+                self.one_page_summary = self.summary_generator.generate_one_page_summary(two_page)
+
+            self.run_stats = self.summary_generator.get_run_stats()
+            logger.info(f"Summary run stats: {self.run_stats}")
+            self.status.set_stage("done", run_stats=self.run_stats)
 
             return True
 
         except Exception as e:
             logger.error(f"Processing failed: {str(e)}")
+            if isinstance(e, NoExtractableTextError):
+                self.error = str(e)
+            self.status.set_stage("failed", error=str(e))
             return False
\ No newline at end of file
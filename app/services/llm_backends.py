@@ -0,0 +1,263 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult, LLMResult
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai", "openai_compatible", "llamacpp", "echo")
+
+# In-process llama.cpp models are expensive to load, so share one per model file;
+# each comes with a lock that serializes calls from every thread of the process
+_local_models: Dict[str, BaseChatModel] = {}
+_local_model_locks: Dict[str, threading.Lock] = {}
+_local_models_lock = threading.Lock()
+
+
+def create_chat_llm(model: Optional[str] = None, temperature: float = 0.1,
+                    openai_api_key: Optional[str] = None,
+                    backend: Optional[str] = None) -> BaseChatModel:
+    """
+    Create a chat model for the configured LLM backend.
+
+    Backends:
+        openai: OpenAI API (needs OPENAI_API_KEY)
+        openai_compatible: Local server exposing the OpenAI API, e.g. llama.cpp
+            `llama-server --cont-batching` or vLLM, at LLM_BASE_URL
+        llamacpp: In-process llama.cpp on CPU from the GGUF file at LLM_MODEL_PATH,
+            shared by the process and called by one thread at a time
+        echo: Offline fake for load tests; replies with the end of the prompt
+
+    Args:
+        model: Model name (ignored by llamacpp, which loads LLM_MODEL_PATH)
+        temperature: Sampling temperature
+        openai_api_key: API key for the openai backend
+        backend: Backend name, defaults to Config.LLM_BACKEND
+
+    Returns:
+        BaseChatModel: LangChain chat model
+    """
+    backend = backend or Config.LLM_BACKEND
+    model = model or Config.LLM_MODEL
+
+    if backend == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            openai_api_key=openai_api_key or Config.OPENAI_API_KEY,
+            model=model,
+            temperature=temperature
+        )
+
+    if backend == "openai_compatible":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            openai_api_key=Config.LLM_API_KEY,
+            base_url=Config.LLM_BASE_URL,
+            model=model,
+            temperature=temperature,
+            max_retries=1
+        )
+
+    if backend == "llamacpp":
+        with _local_models_lock:
+            if Config.LLM_MODEL_PATH not in _local_models:
+                try:
+                    from langchain_community.chat_models import ChatLlamaCpp
+                except ImportError as e:
+                    raise ImportError(
+                        "The llamacpp backend requires llama-cpp-python: pip install llama-cpp-python"
+                    ) from e
+
+                logger.info(f"Loading local model {Config.LLM_MODEL_PATH}")
+                _local_models[Config.LLM_MODEL_PATH] = ChatLlamaCpp(
+                    model_path=Config.LLM_MODEL_PATH,
+                    n_ctx=Config.LLM_CONTEXT_SIZE,
+                    n_threads=Config.LLM_THREADS,
+                    n_batch=512,
+                    max_tokens=1024,
+                    verbose=False
+                )
+                _local_model_locks[Config.LLM_MODEL_PATH] = threading.Lock()
+        return LockedChatModel(
+            llm=_local_models[Config.LLM_MODEL_PATH],
+            lock=_local_model_locks[Config.LLM_MODEL_PATH],
+            temperature=temperature
+        )
+
+    if backend == "echo":
+        return EchoChatModel(delay_seconds=Config.LLM_ECHO_DELAY)
+
+    raise ValueError(f"Unknown LLM backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+class LockedChatModel(BaseChatModel):
+    """
+    Per-caller view of a shared chat model that is not thread-safe.
+
+    Calls hold the model's lock, so request threads, map-reduce workers and
+    evaluation never run it at the same time; each caller's temperature is
+    passed with every call instead of being fixed when the model is loaded.
+    """
+
+    llm: BaseChatModel
+    lock: Any
+    temperature: float = 0.1
+
+    @property
+    def _llm_type(self) -> str:
+        return f"locked-{self.llm._llm_type}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        kwargs.setdefault("temperature", self.temperature)
+        with self.lock:
+            return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class EchoChatModel(BaseChatModel):
+    """
+    Offline chat model that replies with the last echo_chars characters of the prompt.
+
+    Every prompt ends with its context, so the reply carries the text of the
+    documents it was built from; load tests use that to detect answers that
+    were mixed up between concurrent requests.
+    """
+
+    echo_chars: int = 1500
+    # Simulated generation latency per call
+    delay_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        text = str(messages[-1].content)[-self.echo_chars:]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def served_model(model: Optional[str] = None, backend: Optional[str] = None) -> str:
+    """
+    Model that actually answers a request for `model` on a backend.
+
+    llamacpp always runs the GGUF file at LLM_MODEL_PATH and echo ignores the
+    name, so different model names can resolve to the same model.
+    """
+    backend = backend or Config.LLM_BACKEND
+    if backend == "llamacpp":
+        return Config.LLM_MODEL_PATH
+    if backend == "echo":
+        return "echo"
+    return model or Config.LLM_MODEL
+
+
+def default_model_tiers(backend: Optional[str] = None) -> str:
+    """Model tiers used when MODEL_TIERS is unset, for the backend in use when called"""
+    backend = backend or Config.LLM_BACKEND
+    if backend == "openai":
+        return f"fast={Config.MAP_REDUCE_MODEL},standard={Config.LLM_MODEL}"
+    return f"fast={Config.LLM_MODEL},standard={Config.LLM_MODEL}"
+
+
+def max_concurrency(backend: Optional[str] = None) -> int:
+    """
+    Number of prompts to keep in flight at once for a backend.
+
+    A single in-process llama.cpp model is not thread-safe, so it runs prompts
+    one at a time. Servers batch concurrent requests themselves, so all section
+    prompts are sent together.
+    """
+    backend = backend or Config.LLM_BACKEND
+    if backend == "llamacpp":
+        return 1
+    return Config.LLM_MAX_CONCURRENCY
+
+
+class UsageTracker(BaseCallbackHandler):
+    """
+    Callback that accumulates token usage, cost and call latency across LLM calls.
+
+    Works for every backend: usage reported by the provider is used when present,
+    otherwise tokens are estimated from the text length.
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        super().__init__()
+        self.backend = backend or Config.LLM_BACKEND
+        self._lock = threading.Lock()
+        self._started: Dict[Any, float] = {}
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_cost = 0.0
+        self.call_seconds = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started[run_id] = time.time()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started[run_id] = time.time()
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        prompt_tokens, completion_tokens, model_name = self._extract_usage(response)
+        cost = self._cost(model_name, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started is not None:
+                self.call_seconds += time.time() - started
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.total_cost += cost
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+
+    def _extract_usage(self, response: LLMResult):
+        llm_output = response.llm_output or {}
+        model_name = llm_output.get("model_name", "")
+        token_usage = llm_output.get("token_usage") or {}
+
+        if token_usage:
+            return (token_usage.get("prompt_tokens", 0),
+                    token_usage.get("completion_tokens", 0),
+                    model_name)
+
+        prompt_tokens = 0
+        completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                else:
+                    # Rough estimate (~4 characters per token) when the backend reports nothing
+                    completion_tokens += len(generation.text) // 4
+        return prompt_tokens, completion_tokens, model_name
+
+    def _cost(self, model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Provider cost in USD; local backends are free"""
+        if self.backend != "openai" or not model_name:
+            return 0.0
+        try:
+            from langchain_community.callbacks.openai_info import get_openai_token_cost_for_model
+            return (get_openai_token_cost_for_model(model_name, prompt_tokens) +
+                    get_openai_token_cost_for_model(model_name, completion_tokens, is_completion=True))
+        except ValueError:
+            # Unknown model name, no published price
+            return 0.0
@@ -0,0 +1,250 @@
+import re
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from langchain.prompts import PromptTemplate
+from llama_index.core import VectorStoreIndex
+from .llm_backends import create_chat_llm, UsageTracker
+from .summary_cache import SummaryCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever MAP_PROMPT or COLLAPSE_PROMPT changes so cached summaries are not reused
+MAP_PROMPT_VERSION = "1"
+
+MAP_PROMPT = """Summarize the following excerpt from the "{section_label}" section of a financial filing.
+
+**Rules:**
+- Keep every figure, percentage, date, credit rating and debt metric exactly as written
+- Keep segment, product and region names
+- Note year-over-year changes and the reasons given for them
+- Skip boilerplate, legal disclaimers and forward-looking statement notices
+- Maximum 150 words
+
+Excerpt:
+{text}"""
+
+COLLAPSE_PROMPT = """Merge the following partial summaries of a financial filing into one summary.
+
+**Rules:**
+- Keep every figure, percentage, date, credit rating and debt metric
+- Remove repetition across the partial summaries
+- Maximum 300 words
+
+Partial summaries:
+{text}"""
+
+# 10-K / 10-Q headings such as "PART II" or "Item 7A." start a new filing section
+SECTION_HEADING = re.compile(r"^\s*(PART\s+[IVX]+\b.*|ITEM\s+\d+[A-C]?\..*)$", re.IGNORECASE | re.MULTILINE)
+
+
+class MapReduceSummarizer:
+    """
+    Hierarchical summarization over every chunk in the index.
+
+    Chunks are grouped by filing section, each group is summarized (map) by a
+    cheaper model under a bounded worker pool, and the group summaries are
+    merged (reduce) into a single context that feeds the regular section prompts.
+    Group summaries are cached on disk by chunk hash. Failed calls are counted in
+    stats["failed_calls"]; when every group fails there is no context and build_context raises.
+    """
+
+    def __init__(self, index: VectorStoreIndex, openai_api_key: str, cache_dir: str,
+                 model: str = "gpt-3.5-turbo", max_workers: int = 4,
+                 group_char_limit: int = 12000, context_char_limit: int = 24000,
+                 usage_tracker: Optional[UsageTracker] = None):
+        """
+        Initialize the map-reduce summarizer.
+
+        Args:
+            index: Vector index whose docstore holds the parsed chunks
+            openai_api_key: OpenAI API key for LLM access
+            cache_dir: Directory for cached group summaries
+            model: Model used for the map and collapse steps
+            max_workers: Maximum number of concurrent map calls
+            group_char_limit: Maximum characters of chunk text per map call
+            context_char_limit: Maximum characters of the reduced context
+            usage_tracker: Callback accumulating token usage, shared with the caller
+        """
+        self.index = index
+        self.cache_dir = cache_dir
+        self.model = model
+        self.max_workers = max_workers
+        self.group_char_limit = group_char_limit
+        self.context_char_limit = context_char_limit
+
+        self.cache = SummaryCache(self.cache_dir)
+
+        self.llm = create_chat_llm(
+            model=self.model,
+            temperature=0,
+            openai_api_key=openai_api_key
+        )
+        self.usage_tracker = usage_tracker or UsageTracker()
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "groups": 0,
+            "map_calls": 0,
+            "cache_hits": 0,
+            "failed_calls": 0
+        }
+
+    def group_nodes(self) -> List[Tuple[str, List]]:
+        """
+        Group chunks by file and filing section, in document order.
+
+        Groups larger than group_char_limit are split into numbered parts.
+
+        Returns:
+            List[Tuple[str, List]]: (group label, nodes) pairs
+        """
+        groups = []
+        current_key = None
+        current_label = None
+
+        for node in self.index.docstore.docs.values():
+            text = node.get_content()
+            file_name = node.metadata.get("file_name", "document")
+
+            heading = SECTION_HEADING.search(text)
+            if heading:
+                current_label = " ".join(heading.group(1).split())[:80]
+            elif current_key is None or current_key[0] != file_name:
+                current_label = "Front matter"
+
+            key = (file_name, current_label)
+            if key != current_key:
+                groups.append((f"{file_name} - {current_label}", []))
+                current_key = key
+            groups[-1][1].append(node)
+
+        # Split oversized groups so each map call stays within the model context
+        bounded = []
+        for label, nodes in groups:
+            parts = [[]]
+            size = 0
+            for node in nodes:
+                length = len(node.get_content())
+                if parts[-1] and size + length > self.group_char_limit:
+                    parts.append([])
+                    size = 0
+                parts[-1].append(node)
+                size += length
+
+            if len(parts) == 1:
+                bounded.append((label, parts[0]))
+            else:
+                for i, part in enumerate(parts, start=1):
+                    bounded.append((f"{label} (part {i})", part))
+
+        return bounded
+
+    def build_context(self) -> str:
+        """
+        Map every chunk group to a summary and reduce them into one context.
+
+        Returns:
+            str: Combined filing summary used as context for the section prompts
+        """
+        groups = self.group_nodes()
+        self.stats["groups"] = len(groups)
+        logger.info(f"Map-reduce: summarizing {len(groups)} chunk groups with {self.model} "
+                    f"({self.max_workers} workers)")
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="MapSummary") as pool:
+            summaries = list(pool.map(self._summarize_group, groups))
+        logger.info(f"Map-reduce: mapped {len(groups)} groups in {time.time() - start_time:.2f} seconds "
+                    f"({self.stats['cache_hits']} cached)")
+
+        parts = [f"{label}:\n{summary}" for (label, _), summary in zip(groups, summaries) if summary]
+        if groups and not parts:
+            raise RuntimeError(f"Map-reduce: all {len(groups)} chunk group summaries failed")
+        if len(parts) < len(groups):
+            logger.warning(f"Map-reduce: {len(groups) - len(parts)} of {len(groups)} chunk group summaries "
+                           f"failed; sections are written from partial context")
+        return self._reduce(parts)
+
+    def _summarize_group(self, group: Tuple[str, List]) -> str:
+        """Summarize one chunk group, reusing a cached summary when the chunks are unchanged"""
+        label, nodes = group
+        chunk_hashes = [content_hash(node.get_content()) for node in nodes]
+        text = "\n\n".join(node.get_content() for node in nodes)
+
+        return self._cached_call(
+            MAP_PROMPT,
+            {"section_label": label, "text": text},
+            chunk_hashes
+        )
+
+    def _reduce(self, parts: List[str]) -> str:
+        """Collapse group summaries in batches until they fit in the reduced context"""
+        context = "\n\n".join(parts)
+
+        while len(context) > self.context_char_limit and len(parts) > 1:
+            batches = [[]]
+            size = 0
+            for part in parts:
+                if batches[-1] and size + len(part) > self.context_char_limit:
+                    batches.append([])
+                    size = 0
+                batches[-1].append(part)
+                size += len(part)
+
+            if len(batches) == len(parts):
+                # Every summary is already too large on its own; merge them pairwise
+                batches = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+
+            logger.info(f"Map-reduce: collapsing {len(parts)} summaries into {len(batches)}")
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="MapCollapse") as pool:
+                collapsed = list(pool.map(self._collapse_batch, batches))
+            parts = [part for part in collapsed if part]
+            if not parts:
+                raise RuntimeError(f"Map-reduce: all {len(batches)} collapse calls failed")
+            if len(parts) < len(batches):
+                logger.warning(f"Map-reduce: {len(batches) - len(parts)} of {len(batches)} collapse calls "
+                               f"failed; sections are written from partial context")
+            context = "\n\n".join(parts)
+
+        return context
+
+    def _collapse_batch(self, batch: List[str]) -> str:
+        text = "\n\n".join(batch)
+        return self._cached_call(
+            COLLAPSE_PROMPT,
+            {"text": text},
+            [content_hash(text)]
+        )
+
+    def _cached_call(self, template: str, inputs: Dict[str, str], content_hashes: List[str]) -> str:
+        """Run a map/collapse prompt, keyed on disk by prompt version, model and content hashes"""
+        key = SummaryCache.fingerprint(MAP_PROMPT_VERSION, self.model, template, content_hashes)
+
+        summary = self.cache.get(key)
+        if summary is not None:
+            with self._lock:
+                self.stats["cache_hits"] += 1
+            return summary
+
+        try:
+            prompt = PromptTemplate(template=template, input_variables=list(inputs.keys()))
+            response = self.llm.invoke(
+                prompt.format(**inputs),
+                config={"callbacks": [self.usage_tracker]}
+            )
+            summary = response.content.strip()
+
+            with self._lock:
+                self.stats["map_calls"] += 1
+
+        except Exception as e:
+            logger.error(f"Map-reduce summary failed: {str(e)}")
+            with self._lock:
+                self.stats["failed_calls"] += 1
+            return ""
+
+        self.cache.put(key, summary)
+        return summary
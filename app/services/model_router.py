@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Union
+from langchain_core.language_models.chat_models import BaseChatModel
+from app.config import Config
+from app.utils.profiling import span, propagate
+from .llm_backends import create_chat_llm, default_model_tiers, max_concurrency, served_model, UsageTracker
+
+logger = logging.getLogger(__name__)
+
+DIGIT = re.compile(r"\d")
+
+
+class RouteRequest(NamedTuple):
+    """One prompt to route: its context and word limit are used to validate the answer"""
+    prompt: str
+    context: str
+    word_limit: Optional[int] = None
+    complexity: str = "normal"
+
+
+def parse_tiers(spec: str) -> Dict[str, str]:
+    """Parse "fast=gpt-3.5-turbo,standard=gpt-4" into an ordered tier -> model mapping"""
+    tiers = {}
+    for item in spec.split(","):
+        name, _, model = item.strip().partition("=")
+        if not name or not model:
+            raise ValueError(f"Invalid model tier '{item}' (expected name=model)")
+        tiers[name.strip()] = model.strip()
+    return tiers
+
+
+def validate_summary(text: str, context: str, word_limit: Optional[int],
+                     length_tolerance: float = Config.ROUTER_LENGTH_TOLERANCE) -> List[str]:
+    """
+    Cheap checks that a fast model's answer is usable.
+
+    Returns:
+        List[str]: Failed checks (empty, length_overrun, missing_figures); empty when valid
+    """
+    if not text.strip():
+        return ["empty"]
+
+    reasons = []
+    if word_limit and len(text.split()) > word_limit * (1 + length_tolerance):
+        reasons.append("length_overrun")
+    # Financial sections must quote figures whenever the context has any
+    if DIGIT.search(context) and not DIGIT.search(text):
+        reasons.append("missing_figures")
+    return reasons
+
+
+class ModelRouter:
+    """
+    Routes prompts to model tiers by word limit and complexity.
+
+    Each prompt gets a chain of tiers from the routing table, e.g. ["fast", "standard"].
+    Generation starts speculatively on the first tier; answers that fail validation
+    (or errors) escalate to the next tier, and the last tier's answer is kept as is.
+    Every call's latency, tokens and cost are appended to a JSONL log for tuning the table.
+
+    Tiers served by the same model (e.g. every tier on the llamacpp backend) are merged
+    into the largest of them, since escalating between them would rerun the same model.
+    """
+
+    def __init__(self, openai_api_key: str, usage_tracker: Optional[UsageTracker] = None,
+                 tiers: Optional[str] = None, table: Optional[str] = None,
+                 overrides: Optional[str] = None, log_path: Optional[str] = None,
+                 temperature: float = 0.1):
+        """
+        Initialize the router.
+
+        Args:
+            openai_api_key: OpenAI API key for LLM access
+            usage_tracker: Run-wide tracker that also receives every call
+            tiers: Ordered "name=model" pairs, smallest model first; defaults to
+                Config.MODEL_TIERS, or the current backend's default_model_tiers()
+            table: JSON list of rules {"max_words", "complexity", "tiers"}; the first match wins
+                (default Config.MODEL_ROUTING_TABLE)
+            overrides: JSON object of prompt name -> tier chain, checked before the table
+                (default Config.MODEL_ROUTE_OVERRIDES)
+            log_path: JSONL file that receives one record per call (default Config.ROUTING_LOG_PATH)
+            temperature: Sampling temperature
+        """
+        self.openai_api_key = openai_api_key
+        self.usage_tracker = usage_tracker or UsageTracker()
+        # Read when the router is created, so the backend in use picks the default tiers
+        self.tiers = parse_tiers(tiers or Config.MODEL_TIERS or default_model_tiers())
+        self._merged = {}
+        largest_by_model = {served_model(model): tier for tier, model in self.tiers.items()}
+        for tier, model in self.tiers.items():
+            self._merged[tier] = largest_by_model[served_model(model)]
+            if self._merged[tier] != tier:
+                logger.info(f"Model tier '{tier}' runs the same model as '{self._merged[tier]}'; merging them")
+        self.table = json.loads(table or Config.MODEL_ROUTING_TABLE)
+        self.overrides = json.loads(overrides or Config.MODEL_ROUTE_OVERRIDES)
+        self.log_path = log_path or Config.ROUTING_LOG_PATH
+        self.temperature = temperature
+
+        for chain in [rule["tiers"] for rule in self.table] + list(self.overrides.values()):
+            unknown = [tier for tier in chain if tier not in self.tiers]
+            if unknown:
+                raise ValueError(f"Unknown model tier(s) {unknown} in routing table")
+
+        self._llms: Dict[str, BaseChatModel] = {}
+        self._lock = threading.Lock()
+        self.records = []
+
+    def route(self, name: str, word_limit: Optional[int] = None, complexity: str = "normal") -> List[str]:
+        """Tier chain for a prompt, with tiers served by the same model merged"""
+        chain = self._table_chain(name, word_limit, complexity)
+        merged = []
+        for tier in chain:
+            if self._merged[tier] not in merged:
+                merged.append(self._merged[tier])
+        return merged
+
+    def _table_chain(self, name: str, word_limit: Optional[int], complexity: str) -> List[str]:
+        if name in self.overrides:
+            return self.overrides[name]
+        for rule in self.table:
+            if rule.get("max_words") is not None and (word_limit is None or word_limit > rule["max_words"]):
+                continue
+            if rule.get("complexity") and rule["complexity"] != complexity:
+                continue
+            return rule["tiers"]
+        # No matching rule: use the largest model
+        return [list(self.tiers)[-1]]
+
+    def describe(self, name: str, word_limit: Optional[int] = None, complexity: str = "normal") -> str:
+        """Models a prompt may run on, e.g. "gpt-3.5-turbo>gpt-4"; part of cache keys"""
+        return ">".join(served_model(self.tiers[tier]) for tier in self.route(name, word_limit, complexity))
+
+    def _llm(self, tier: str) -> BaseChatModel:
+        with self._lock:
+            if tier not in self._llms:
+                self._llms[tier] = create_chat_llm(
+                    model=self.tiers[tier],
+                    temperature=self.temperature,
+                    openai_api_key=self.openai_api_key
+                )
+            return self._llms[tier]
+
+    def generate(self, requests: Dict[str, RouteRequest]) -> Dict[str, Union[str, Exception]]:
+        """
+        Generate answers for named prompts, escalating through each prompt's tier chain.
+
+        Args:
+            requests: Prompt name -> RouteRequest
+
+        Returns:
+            Dict[str, Union[str, Exception]]: Answer text, or the last error, per prompt name
+        """
+        chains = {name: self.route(name, request.word_limit, request.complexity)
+                  for name, request in requests.items()}
+        position = {name: 0 for name in requests}
+        results = {}
+
+        while position:
+            # Prompts on the same tier go out as one batch; tiers run side by side,
+            # or one after another on backends that take one prompt at a time
+            by_tier = {}
+            for name, index in position.items():
+                by_tier.setdefault(chains[name][index], []).append(name)
+
+            workers = len(by_tier) if max_concurrency() > 1 else 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(propagate(self._run_tier), tier, names, requests, chains, position)
+                           for tier, names in by_tier.items()]
+                rounds = [future.result() for future in futures]
+
+            for outcome in rounds:
+                for name, (answer, escalate) in outcome.items():
+                    if escalate:
+                        position[name] += 1
+                    else:
+                        results[name] = answer
+                        del position[name]
+
+        return results
+
+    def _run_tier(self, tier: str, names: List[str], requests: Dict[str, RouteRequest],
+                  chains: Dict[str, List[str]], position: Dict[str, int]) -> Dict:
+        """Batch one tier's prompts; returns name -> (answer, whether to escalate)"""
+        trackers = {name: UsageTracker() for name in names}
+        started = time.time()
+        with span("llm", tier=tier, model=self.tiers[tier], prompts=names):
+            responses = self._llm(tier).batch(
+                [requests[name].prompt for name in names],
+                config=[{"callbacks": [self.usage_tracker, trackers[name]], "max_concurrency": max_concurrency()}
+                        for name in names],
+                return_exceptions=True
+            )
+        batch_seconds = time.time() - started
+
+        outcome = {}
+        for name, response in zip(names, responses):
+            request = requests[name]
+            has_next = position[name] + 1 < len(chains[name])
+
+            if isinstance(response, Exception):
+                answer, reasons = response, ["error"]
+            else:
+                answer = response.content.strip()
+                reasons = validate_summary(answer, request.context, request.word_limit)
+
+            escalate = bool(reasons) and has_next
+            if escalate:
+                logger.info(f"Escalating '{name}' from {tier}: {', '.join(reasons)}")
+
+            tracker = trackers[name]
+            self._record({
+                "name": name,
+                "tier": tier,
+                "model": self.tiers[tier],
+                "attempt": position[name] + 1,
+                "word_limit": request.word_limit,
+                "complexity": request.complexity,
+                # Per-call latency when the callback saw it, else the whole batch
+                "seconds": round(tracker.call_seconds or batch_seconds, 3),
+                "prompt_tokens": tracker.prompt_tokens,
+                "completion_tokens": tracker.completion_tokens,
+                "cost": round(tracker.total_cost, 6),
+                "failed_checks": reasons,
+                "escalated": escalate
+            })
+            outcome[name] = (answer, escalate)
+        return outcome
+
+    def _record(self, record: Dict) -> None:
+        record["timestamp"] = round(time.time(), 3)
+        with self._lock:
+            self.records.append(record)
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write routing log {self.log_path}: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Calls, escalations, seconds and cost per tier for this router's calls"""
+        with self._lock:
+            records = list(self.records)
+        per_tier = {}
+        for record in records:
+            tier = per_tier.setdefault(record["tier"], {"calls": 0, "escalations": 0, "seconds": 0.0, "cost": 0.0})
+            tier["calls"] += 1
+            tier["escalations"] += int(record["escalated"])
+            tier["seconds"] = round(tier["seconds"] + record["seconds"], 3)
+            tier["cost"] = round(tier["cost"] + record["cost"], 6)
+        return per_tier
@@ -0,0 +1,128 @@
+import os
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, NamedTuple, Tuple
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+
+class PageRange(NamedTuple):
+    """Pages [start, end) of one PDF, extracted by a single task"""
+    path: str
+    start: int
+    end: int
+    page_count: int
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def extract_pages(task: PageRange) -> List[Tuple[str, str]]:
+    """
+    Extract the text of a page range. Runs in a worker process, so it only uses pypdf.
+
+    Args:
+        task: Page range to extract
+
+    Returns:
+        List[Tuple[str, str]]: (page_label, text) per page, labelled like llama_index's PDFReader
+    """
+    reader = PdfReader(task.path)
+    labels = reader.page_labels
+    return [(labels[page], reader.pages[page].extract_text())
+            for page in range(task.start, task.end)]
+
+
+def plan_tasks(paths: List[str], pages_per_task: int) -> List[PageRange]:
+    """Split each PDF into page ranges of at most pages_per_task pages"""
+    tasks = []
+    for path in paths:
+        page_count = len(PdfReader(path).pages)
+        for start in range(0, page_count, pages_per_task):
+            tasks.append(PageRange(path, start, min(start + pages_per_task, page_count), page_count))
+    return tasks
+
+
+def _init_worker():
+    """Runs once in each extraction process; keep it light, the workers only need pypdf"""
+    # Ctrl-C stops the server, which shuts the pool down; the workers don't handle it themselves
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide extraction pool, kept between requests so workers start only once"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Spawned, not forked: the parent holds torch/tokenizer threads that don't survive fork
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker)
+            _pool_workers = workers
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (e.g. a worker was OOM-killed) so the next request starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    """Stop the extraction workers (benchmarks and tests)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def extract_parallel(tasks: List[PageRange], workers: int) -> Iterator[Tuple[int, List[Tuple[str, str]]]]:
+    """
+    Extract page ranges across a process pool, yielding results as each task finishes.
+
+    Args:
+        tasks: Page ranges from plan_tasks()
+        workers: Number of worker processes; 1 extracts serially in this process
+
+    Returns:
+        Iterator of (task index, pages) in completion order
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for i, task in enumerate(tasks):
+            yield i, extract_pages(task)
+        return
+
+    pool = _get_pool(workers)
+    futures = {}
+    try:
+        for i, task in enumerate(tasks):
+            futures[pool.submit(extract_pages, task)] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                yield i, future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to extract {os.path.basename(tasks[i].path)} "
+                             f"pages {tasks[i].start + 1}-{tasks[i].end}: {str(e)}")
+                raise
+    except BrokenProcessPool:
+        logger.error("PDF extraction worker died; restarting the pool for the next request")
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from llama_index.core import QueryBundle, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import NodeWithScore
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_embeddings (
+    model TEXT NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, query)
+);
+CREATE INDEX IF NOT EXISTS query_embeddings_lru ON query_embeddings (last_used);
+CREATE TABLE IF NOT EXISTS retrievals (
+    index_version TEXT NOT NULL,
+    query TEXT NOT NULL,
+    top_k INTEGER NOT NULL,
+    nodes TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (index_version, query, top_k)
+);
+CREATE INDEX IF NOT EXISTS retrievals_lru ON retrievals (last_used);
+"""
+
+
+class QueryCache:
+    """
+    On-disk LRU caches of query embeddings and retrieval results.
+
+    Embeddings are keyed by embedding model and query text. Retrievals are
+    keyed by index version, query and top_k, so they are invalidated whenever
+    the indexed content changes; entries for old versions age out by LRU.
+    SQLite keeps the caches consistent across web workers and threads.
+    """
+
+    def __init__(self, embed_model: BaseEmbedding, db_path: str = Config.QUERY_CACHE_PATH,
+                 max_embeddings: int = Config.QUERY_EMBEDDING_CACHE_SIZE,
+                 max_retrievals: int = Config.RETRIEVAL_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            embed_model: Model used to embed queries on a cache miss
+            db_path: SQLite database file, shared by every process
+            max_embeddings: Query embeddings kept before the least recently used are evicted
+            max_retrievals: Retrieval results kept before the least recently used are evicted
+        """
+        self.embed_model = embed_model
+        self.db_path = db_path
+        self.max_embeddings = max_embeddings
+        self.max_retrievals = max_retrievals
+        self.stats = {"embedding_hits": 0, "embedding_misses": 0, "retrieval_hits": 0, "retrieval_misses": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            # Readers don't block the writer of another worker
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per operation: safe from any thread or forked worker"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_query_embedding(self, query: str) -> List[float]:
+        """Embedding of a query, computed at most once per model and query text"""
+        model = self.embed_model.model_name
+        with self._connect() as conn:
+            row = conn.execute("SELECT embedding FROM query_embeddings WHERE model = ? AND query = ?",
+                               (model, query)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE query_embeddings SET last_used = ? WHERE model = ? AND query = ?",
+                             (time.time(), model, query))
+                self._count("embedding_hits")
+                return array("f", row[0]).tolist()
+
+        self._count("embedding_misses")
+        embedding = self.embed_model.get_query_embedding(query)
+
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                         (model, query, array("f", embedding).tobytes(), time.time()))
+            self._evict(conn, "query_embeddings", self.max_embeddings)
+        return embedding
+
+    def retrieve(self, index: VectorStoreIndex, query: str, top_k: int,
+                 index_version: Optional[str] = None) -> List[NodeWithScore]:
+        """
+        Top-k nodes for a query, reusing the node IDs retrieved earlier from the same index version.
+
+        Args:
+            index: Index to retrieve from
+            query: Query text
+            top_k: Number of nodes to retrieve
+            index_version: Version of the index content; without it results are not cached
+
+        Returns:
+            List[NodeWithScore]: Retrieved nodes with their similarity scores
+        """
+        if index_version:
+            cached = self._cached_nodes(index, query, top_k, index_version)
+            if cached is not None:
+                self._count("retrieval_hits")
+                return cached
+            self._count("retrieval_misses")
+
+        # Plain retrieval: the query engine would add a synthesis call on llama_index's
+        # default (OpenAI) LLM, bypassing the configured backend
+        retriever = index.as_retriever(similarity_top_k=top_k)
+        nodes = retriever.retrieve(QueryBundle(query_str=query, embedding=self.get_query_embedding(query)))
+
+        if index_version:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO retrievals VALUES (?, ?, ?, ?, ?)",
+                             (index_version, query, top_k,
+                              json.dumps([[n.node.node_id, n.score] for n in nodes]), time.time()))
+                self._evict(conn, "retrievals", self.max_retrievals)
+        return nodes
+
+    def _cached_nodes(self, index: VectorStoreIndex, query: str, top_k: int,
+                      index_version: str) -> Optional[List[NodeWithScore]]:
+        key = (index_version, query, top_k)
+        with self._connect() as conn:
+            row = conn.execute("SELECT nodes FROM retrievals WHERE index_version = ? AND query = ? AND top_k = ?",
+                               key).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE retrievals SET last_used = ? WHERE index_version = ? AND query = ? AND top_k = ?",
+                         (time.time(),) + key)
+
+        try:
+            return [NodeWithScore(node=index.docstore.get_node(node_id), score=score)
+                    for node_id, score in json.loads(row[0])]
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring cached retrieval for '{query}': {str(e)}")
+            return None
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection, table: str, max_entries: int) -> None:
+        """Drop the least recently used entries beyond max_entries"""
+        conn.execute(f"DELETE FROM {table} WHERE rowid IN "
+                     f"(SELECT rowid FROM {table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (max_entries,))
+
+    def hit_rates(self) -> Dict:
+        """Hit counts and rates since this cache object was created"""
+        with self._lock:
+            stats = dict(self.stats)
+        for kind in ("embedding", "retrieval"):
+            lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_rate"] = round(stats[f"{kind}_hits"] / lookups, 3) if lookups else 0.0
+        return stats
@@ -2,12 +2,23 @@ import os
 import logging
 import pandas as pd
 from typing import List, Dict
-from llama_index.core import VectorStoreIndex, load_index_from_storage, StorageContext, Settings, QueryBundle
+from llama_index.core import VectorStoreIndex, Settings
 from ragas.metrics import answer_relevancy, faithfulness, context_recall
 from ragas import evaluate
-from langchain_openai import OpenAI
+from ragas.embeddings import LlamaIndexEmbeddingsWrapper
 from datasets import Dataset
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from app.config import Config
+from .llm_backends import create_chat_llm
+from .embeddings import get_embed_model
+from .document_ingester import load_persisted_index, read_index_version
+from .query_cache import QueryCache
+
+ANSWER_PROMPT = """Answer the question using only the context below. Be concise and include exact figures.
+
+Context:
+{context}
+
+Question: {question}"""
 
 logger = logging.getLogger(__name__)
 
@@ -15,19 +26,25 @@ class RagaEvaluator:
     def __init__(self, vector_dir: str, ground_truth: List[Dict],  openai_api_key: str):
         self.vector_dir = vector_dir
         self.ground_truth = ground_truth
-        os.environ["OPENAI_API_KEY"] = openai_api_key
-        self.llm = OpenAI(api_key=openai_api_key)
-        self.embed_model = HuggingFaceEmbedding(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        if openai_api_key:
+            os.environ["OPENAI_API_KEY"] = openai_api_key
+        # Same backend as the summaries; also used by RAGAS as the judge model
+        self.llm = create_chat_llm(
+            model=Config.LLM_MODEL,
+            temperature=0,
+            openai_api_key=openai_api_key
         )
+        self.embed_model = get_embed_model(Config.EMBEDDING_MODEL)
         Settings.embed_model = self.embed_model
         self.index = self._load_index()
+        # Ground-truth questions are fixed: embed each once, retrieve once per index version
+        self.index_version = read_index_version(self.vector_dir)
+        self.query_cache = QueryCache(self.embed_model)
     def _load_index(self) -> VectorStoreIndex:
         """Load index with dimension validation"""
         try:
-            # Load index with MiniLM config
-            storage_context = StorageContext.from_defaults(persist_dir=self.vector_dir)
-            index = load_index_from_storage(storage_context)
+            # Load index with MiniLM config; the FAISS file may hold float32 or quantized vectors
+            index = load_persisted_index(self.vector_dir)
                 
             return index
             
@@ -41,28 +58,26 @@ class RagaEvaluator:
         contexts = []
         references = []
 
-        query_engine = self.index.as_query_engine(
-            similarity_top_k=6,
-            vector_store_query_mode="default"
-        )
-
+        # Retrieve then answer with the configured backend; the query engine would
+        # synthesize with llama_index's default OpenAI LLM instead
         for qa in self.ground_truth:
             try:
-                query_embedding = self.embed_model.get_text_embedding(qa["question"])
-                query_bundle = QueryBundle(
-                    query_str=qa["question"],
-                    embedding=query_embedding,
-                    custom_embedding_strs=[qa["question"]]
-                )
-                response = query_engine.query(query_bundle)
+                source_nodes = self.query_cache.retrieve(self.index, qa["question"], 6, self.index_version)
+                context_texts = [n.node.text for n in source_nodes]
+                response = self.llm.invoke(ANSWER_PROMPT.format(
+                    context="\n\n".join(context_texts),
+                    question=qa["question"]
+                ))
                 questions.append(qa["question"])
-                answers.append(str(response))
+                answers.append(response.content.strip())
                 references.append(qa["answer"])
-                contexts.append([n.node.text for n in response.source_nodes])
+                contexts.append(context_texts)
             except Exception as e:
                 logger.error(f"Query failed for '{qa['question']}': {str(e)}")
                 continue
 
+        logger.info(f"Query cache: {self.query_cache.hit_rates()}")
+
         return Dataset.from_dict({
             "question": questions,
             "answer": answers,
@@ -77,6 +92,8 @@ class RagaEvaluator:
         result = evaluate(
             dataset,
             metrics=[answer_relevancy, faithfulness, context_recall],
+            llm=self.llm,
+            embeddings=LlamaIndexEmbeddingsWrapper(self.embed_model)
         )
 
         return result.to_pandas()
\ No newline at end of file
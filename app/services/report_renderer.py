@@ -0,0 +1,276 @@
+import os
+import io
+import re
+import json
+import html
+import hashlib
+import logging
+import textwrap
+import threading
+import zipfile
+from typing import Dict, List, Tuple, Union
+from xml.sax.saxutils import escape
+from app.utils.atomic_write import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the output of any renderer changes so cached artifacts are rebuilt
+RENDER_VERSION = "2"
+
+SKELETON_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "docx")
+SKELETON_PARTS = (
+    "[Content_Types].xml",
+    "_rels/.rels",
+    "word/_rels/document.xml.rels",
+    "word/styles.xml",
+    "word/document.xml"
+)
+
+MIMETYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "md": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "pdf": "application/pdf"
+}
+
+TITLE = "Financial Summary Report"
+# Summary content saved next to the DOCX files, read back to render other formats
+SUMMARIES_FILE = "summaries.json"
+
+SummaryContent = Union[str, Dict[str, str]]
+
+# Control characters XML 1.0 forbids; Word refuses documents that contain them
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_skeleton = None
+_skeleton_lock = threading.Lock()
+
+
+def _load_skeleton() -> Dict[str, str]:
+    """Read the prebuilt DOCX parts once per process"""
+    global _skeleton
+    with _skeleton_lock:
+        if _skeleton is None:
+            parts = {}
+            for name in SKELETON_PARTS:
+                with open(os.path.join(SKELETON_DIR, name), "r", encoding="utf-8") as f:
+                    parts[name] = f.read()
+            _skeleton = parts
+    return _skeleton
+
+
+def _blocks(content: SummaryContent) -> List[Tuple[str, str]]:
+    """Flatten summary content into (heading, text) blocks; heading is empty for the 1-page summary"""
+    if isinstance(content, dict):
+        return [(title, text) for title, text in content.items() if text]
+    return [("", content)]
+
+
+def _docx_paragraph(text: str, size: int = None, bold: bool = False, italic: bool = False,
+                    align: str = None, space_after: int = None) -> str:
+    """WordprocessingML for one paragraph; size in points, space_after in points"""
+    ppr = ""
+    if align or space_after:
+        ppr = "<w:pPr>"
+        if space_after:
+            ppr += f'<w:spacing w:after="{space_after * 20}"/>'
+        if align:
+            ppr += f'<w:jc w:val="{align}"/>'
+        ppr += "</w:pPr>"
+
+    rpr = ""
+    if size or bold or italic:
+        rpr = "<w:rPr>"
+        if bold:
+            rpr += "<w:b/>"
+        if italic:
+            rpr += "<w:i/>"
+        if size:
+            rpr += f'<w:sz w:val="{size * 2}"/>'
+        rpr += "</w:rPr>"
+
+    # Line breaks inside a paragraph become <w:br/>, as python-docx does
+    text = INVALID_XML_CHARS.sub("", text)
+    lines = [f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in text.split("\n")]
+    return f"<w:p>{ppr}<w:r>{rpr}{'<w:br/>'.join(lines)}</w:r></w:p>"
+
+
+def render_docx(content: SummaryContent, generated_on: str) -> bytes:
+    """
+    Render summary content by patching the body of the prebuilt DOCX skeleton.
+
+    Args:
+        content: Summary content (dict for 2-page, string for 1-page)
+        generated_on: Date shown under the title
+
+    Returns:
+        bytes: DOCX file contents
+    """
+    paragraphs = [
+        _docx_paragraph(TITLE, size=14, bold=True, align="center"),
+        _docx_paragraph(f"Generated on: {generated_on}", size=8, italic=True, align="center")
+    ]
+    for heading, text in _blocks(content):
+        if heading:
+            paragraphs.append(_docx_paragraph(heading, size=11, bold=True, align="left"))
+            paragraphs.append(_docx_paragraph(text, space_after=6))
+        else:
+            paragraphs.append(_docx_paragraph(text))
+
+    parts = _load_skeleton()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        for name, xml in parts.items():
+            if name == "word/document.xml":
+                xml = xml.replace("{body}", "\n".join(paragraphs))
+            docx.writestr(name, xml)
+    return buffer.getvalue()
+
+
+def render_markdown(content: SummaryContent, generated_on: str) -> str:
+    lines = [f"# {TITLE}", "", f"*Generated on: {generated_on}*", ""]
+    for heading, text in _blocks(content):
+        if heading:
+            lines += [f"## {heading}", ""]
+        lines += [text.strip(), ""]
+    return "\n".join(lines)
+
+
+def render_html(content: SummaryContent, generated_on: str) -> str:
+    body = [f"<h1>{html.escape(TITLE)}</h1>",
+            f'<p class="generated"><em>Generated on: {html.escape(generated_on)}</em></p>']
+    for heading, text in _blocks(content):
+        if heading:
+            body.append(f"<h2>{html.escape(heading)}</h2>")
+        paragraphs = [p for p in text.strip().split("\n\n") if p.strip()]
+        body += [f"<p>{html.escape(p).replace(chr(10), '<br>')}</p>" for p in paragraphs]
+
+    return ("<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\">\n"
+            f"<title>{html.escape(TITLE)}</title>\n"
+            "<style>body{font-family:Calibri,Arial,sans-serif;font-size:11pt;max-width:8in;margin:0.4in auto;}"
+            "h1{font-size:14pt;text-align:center;}h2{font-size:11pt;margin-bottom:0;}"
+            ".generated{font-size:8pt;text-align:center;}</style>\n"
+            "</head>\n<body>\n" + "\n".join(body) + "\n</body>\n</html>\n")
+
+
+def _pdf_text(text: str) -> str:
+    """Escape a string for a PDF literal; characters outside WinAnsi (cp1252) are replaced"""
+    text = text.encode("cp1252", "replace").decode("cp1252")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_pdf(content: SummaryContent, generated_on: str) -> bytes:
+    """
+    Render summary content as a text-only PDF (Letter, 0.4 inch margins, built-in Helvetica).
+
+    Returns:
+        bytes: PDF file contents
+    """
+    page_width, page_height, margin = 612, 792, 29
+    # (font resource, size, centered, text) per line; ~0.5 em average Helvetica glyph width
+    lines = [("F2", 14, True, TITLE), ("F3", 8, True, f"Generated on: {generated_on}"), ("F1", 10, False, "")]
+    for heading, text in _blocks(content):
+        if heading:
+            lines.append(("F2", 11, False, heading))
+        for raw_line in text.strip().split("\n"):
+            wrapped = textwrap.wrap(raw_line, width=int((page_width - 2 * margin) / 5.5)) or [""]
+            lines += [("F1", 10, False, line) for line in wrapped]
+        lines.append(("F1", 10, False, ""))
+
+    pages = [[]]
+    y = page_height - margin
+    for font, size, centered, text in lines:
+        leading = size * 1.3
+        if y - leading < margin:
+            pages.append([])
+            y = page_height - margin
+        y -= leading
+        x = margin
+        if centered:
+            x = max(margin, (page_width - len(text) * size * 0.5) / 2)
+        if text:
+            pages[-1].append(f"BT /{font} {size} Tf {x:.1f} {y:.1f} Td ({_pdf_text(text)}) Tj ET")
+
+    # Objects: 1 catalog, 2 page tree, 3-5 fonts, then a page + content stream pair per page
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Oblique /Encoding /WinAnsiEncoding >>"
+    ]
+    page_ids = []
+    for commands in pages:
+        stream = "\n".join(commands).encode("cp1252", "replace")
+        page_ids.append(len(objects) + 1)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R /F3 5 0 R >> >> "
+                       f"/Contents {len(objects) + 2} 0 R >>")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        body = obj if isinstance(obj, bytes) else obj.encode("cp1252", "replace")
+        output.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    xref_offset = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return output.getvalue()
+
+
+RENDERERS = {
+    "docx": render_docx,
+    "md": render_markdown,
+    "html": render_html,
+    "pdf": render_pdf
+}
+
+
+class ReportRenderer:
+    """
+    Renders summaries to DOCX/Markdown/HTML/PDF on demand.
+
+    Artifacts are cached on disk by a hash of the content, so each format is
+    rendered at most once per summary, on first download.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def render(self, content: SummaryContent, generated_on: str, fmt: str) -> bytes:
+        """Render content without caching"""
+        if fmt not in RENDERERS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        rendered = RENDERERS[fmt](content, generated_on)
+        return rendered.encode("utf-8") if isinstance(rendered, str) else rendered
+
+    def get_path(self, content: SummaryContent, generated_on: str, fmt: str) -> str:
+        """
+        Return the path of the rendered artifact, rendering it on first request.
+
+        Args:
+            content: Summary content (dict for 2-page, string for 1-page)
+            generated_on: Date shown under the title
+            fmt: One of docx, md, html, pdf
+
+        Returns:
+            str: Path of the cached artifact
+        """
+        key_source = json.dumps([RENDER_VERSION, fmt, generated_on, content], sort_keys=True)
+        key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, f"{key}.{fmt}")
+
+        if not os.path.exists(path):
+            # Concurrent downloads never serve a partial file
+            write_atomic(path, self.render(content, generated_on, fmt))
+            logger.info(f"Rendered {fmt} artifact {path}")
+
+        return path
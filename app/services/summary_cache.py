@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+import time
+import logging
+from typing import Iterable, Optional
+from app.utils.atomic_write import write_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Stable identity of a chunk or prompt, independent of generated node IDs"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Content-addressed store of generated summaries.
+
+    Entries are keyed by a fingerprint of everything that determines the
+    output (prompt version, model and the exact context), so a summary is
+    regenerated only when one of those inputs changes. Reads refresh an
+    entry's modification time, and prune() removes entries unused for longer
+    than a maximum age.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(*parts: Iterable[str]) -> str:
+        """Fingerprint of several input components (each a string or list of strings)"""
+        flattened = []
+        for part in parts:
+            if isinstance(part, str):
+                flattened.append(part)
+            else:
+                flattened.append("\x1f".join(part))
+        return content_hash("\x1e".join(flattened))
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)["summary"]
+            os.utime(path)
+            return summary
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable summary cache entry {path}: {str(e)}")
+            return None
+
+    def put(self, key: str, summary: str, **details) -> None:
+        """Store a summary with optional details (section, node IDs, prompt version) for inspection"""
+        # Concurrent runs, in any worker process, never read a partial entry
+        write_atomic(self._path(key), json.dumps(dict(details, summary=summary)))
+
+    def prune(self, max_age_seconds: float) -> int:
+        """
+        Delete entries that were neither written nor read within max_age_seconds.
+
+        Returns:
+            int: Number of files removed
+        """
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                # Removed or replaced by a concurrent run
+                continue
+        if removed:
+            logger.info(f"Pruned {removed} summary cache entries from {self.cache_dir}")
+        return removed
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
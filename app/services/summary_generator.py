@@ -1,28 +1,49 @@
 import os
+import json
 import logging
 import threading
 import time
 from datetime import datetime
-from typing import Dict, List
-from docx import Document as DocxDocument
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from typing import Dict, List, Optional, Tuple
 import openai
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.callbacks import get_openai_callback
 from llama_index.core import VectorStoreIndex
+from app.config import Config
+from app.utils.profiling import span, propagate
+from .llm_backends import max_concurrency, UsageTracker
+from .model_router import ModelRouter, RouteRequest
+from .map_reduce import MapReduceSummarizer
+from .summary_cache import SummaryCache, content_hash
+from .query_cache import QueryCache
+from .embeddings import get_embed_model
+from .report_renderer import render_docx, SUMMARIES_FILE
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the section or one-page prompts change in a way the template text
+# doesn't capture, so cached summaries are regenerated
+SECTION_PROMPT_VERSION = "1"
+
+ONE_PAGE_PROMPT = """
+            Using the detailed report sections below, create a executive summary that captures:
+
+            1. The company's primary business and financial position
+            2. Key performance highlights across segments
+            3. The most significant strengths, weaknesses, and future outlook
+            4. Credit Rating Info
+
+            Detailed Report:
+            {detailed_report}
+            """
+
 class SummaryGenerator:
     """
     Generates financial summaries from documents using RAG approach.
     Creates both 2-page and 1-page summary documents.
     """
 
-    def __init__(self, index: VectorStoreIndex, output_dir: str, openai_api_key: str):
+    def __init__(self, index: VectorStoreIndex, output_dir: str, openai_api_key: str,
+                 mode: str = "retrieval", index_version: Optional[str] = None):
         """
         Initialize the summary generator.
 
@@ -30,19 +51,49 @@ class SummaryGenerator:
             index: Vector index for retrieval
             output_dir: Directory to save output documents
             openai_api_key: OpenAI API key for LLM access
+            mode: "retrieval" for top-k context per section, "map_reduce" to
+                summarize every chunk hierarchically (for very long filings)
+            index_version: Version of the indexed content; retrievals are cached per version
         """
-        logger.info("Initializing SummaryGenerator")
+        if mode not in ("retrieval", "map_reduce"):
+            raise ValueError(f"Unknown summary mode: {mode}")
+
+        logger.info(f"Initializing SummaryGenerator ({mode} mode)")
         self.index = index
         self.output_dir = output_dir
-
-        # Configure OpenAI
-        openai.api_key = openai_api_key
-        self.llm = ChatOpenAI(
+        self.mode = mode
+        self.generated_on = datetime.now().strftime('%B %d, %Y')
+
+        # Token usage, cost and latency across all LLM calls, for throughput reporting
+        self.usage_tracker = UsageTracker()
+        self.run_started = time.time()
+
+        # Sections whose retrieved context and prompt are unchanged since the last run
+        # are reused instead of regenerated
+        self.section_cache = SummaryCache(Config.SECTION_CACHE_DIR)
+        self.cache_stats = {"sections_reused": 0, "one_page_reused": False}
+
+        # Section queries are the same on every run: embed each once, and retrieve
+        # once per index version
+        self.index_version = index_version
+        self.query_cache = QueryCache(get_embed_model(Config.EMBEDDING_MODEL), db_path=Config.QUERY_CACHE_PATH)
+
+        self.map_reducer = None
+        if self.mode == "map_reduce":
+            self.map_reducer = MapReduceSummarizer(
+                index=self.index,
                 openai_api_key=openai_api_key,
-                model="gpt-4",
-                temperature=0.1
+                cache_dir=Config.MAP_SUMMARY_CACHE_DIR,
+                model=Config.MAP_REDUCE_MODEL,
+                max_workers=min(Config.MAP_REDUCE_WORKERS, max_concurrency()),
+                usage_tracker=self.usage_tracker
             )
 
+        # Configure the LLM backend (OpenAI by default, see Config.LLM_BACKEND); each prompt
+        # runs on the model tier the routing table assigns it (Config.MODEL_ROUTING_TABLE)
+        openai.api_key = openai_api_key
+        self.router = ModelRouter(openai_api_key, usage_tracker=self.usage_tracker)
+
         # Load summary prompts
         self.summary_prompts = {
             "business_overview": {
@@ -150,7 +201,8 @@ class SummaryGenerator:
 
                 Context: {context_str}""",
                 "query": "Extract material strengths, weaknesses, opportunities and threats with specific examples",
-                "word_limit": 125
+                "word_limit": 125,
+                "complexity": "high"
             },
             "credit_rating_analysis": {
                 "prompt": """Provide Credit rating analysis:
@@ -171,16 +223,18 @@ class SummaryGenerator:
               - Note any concerns raised by rating agencies
                 Context: {context_str}""",
               "query": "Extract credit rating information, debt metrics, and rating agency opinions",
-              "word_limit": 150
+              "word_limit": 150,
+              "complexity": "high"
             }
         }
 
-    def generate_section_summary(self, section_name: str) -> str:
+    def generate_section_summary(self, section_name: str, context: str = None) -> str:
         """
         Generate summary for a specific section using RAG.
 
         Args:
             section_name: Name of the section to generate summary for
+            context: Pre-built context (map-reduce mode); retrieved from the index if omitted
 
         Returns:
             str: Generated summary text
@@ -189,46 +243,66 @@ class SummaryGenerator:
             logger.error(f"Unknown section name: {section_name}")
             return ""
 
-        prompt_data = self.summary_prompts[section_name]
-        query = prompt_data["query"]
-        word_limit = prompt_data["word_limit"]
-
+        word_limit = self.summary_prompts[section_name]["word_limit"]
         logger.info(f"Generating '{section_name}' summary with {word_limit} word limit")
 
         try:
-            # Create query engine from index
-            query_engine = self.index.as_query_engine()
+            if context is None:
+                context, _ = self._retrieve_context(section_name)
 
-            # Execute query to get relevant context
-            start_time = time.time()
-            response = query_engine.query(query)
-            query_time = time.time() - start_time
-
-            logger.info(f"Retrieved context for '{section_name}' in {query_time:.2f} seconds")
-
-            # Create LangChain prompt
-            template = prompt_data["prompt"]
-            prompt = PromptTemplate(
-                template=template,
-                input_variables=["context_str"]
-            )
-
-            # Create chain
-            chain = LLMChain(llm=self.llm, prompt=prompt)
-
-            # Generate summary with context
-            with get_openai_callback() as cb:
-                summary = chain.run(context_str=response.response)
-
-            # Log token usage
-            logger.info(f"Generated '{section_name}' summary using {cb.total_tokens} tokens")
-
-            return summary.strip()
+            answer = self.router.generate({section_name: self._route_request(section_name, context)})[section_name]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
 
         except Exception as e:
             logger.error(f"Failed to generate '{section_name}' summary: {str(e)}")
             return f"Error generating {section_name} summary."
 
+    def _retrieve_context(self, section_name: str) -> Tuple[str, List[str]]:
+        """Retrieve the top-k chunks for a section's query as raw context text and chunk content hashes"""
+        query = self.summary_prompts[section_name]["query"]
+
+        start_time = time.time()
+        with span("retrieve", section=section_name):
+            nodes = self.query_cache.retrieve(self.index, query, Config.SECTION_TOP_K, self.index_version)
+        query_time = time.time() - start_time
+
+        logger.info(f"Retrieved context for '{section_name}' in {query_time:.2f} seconds")
+        contents = [node.node.get_content() for node in nodes]
+        return "\n\n".join(contents), [content_hash(content) for content in contents]
+
+    def _section_prompt(self, section_name: str, context: str) -> str:
+        prompt = PromptTemplate(
+            template=self.summary_prompts[section_name]["prompt"],
+            input_variables=["context_str"]
+        )
+        return prompt.format(context_str=context)
+
+    def _route_request(self, section_name: str, context: str) -> RouteRequest:
+        section = self.summary_prompts[section_name]
+        return RouteRequest(
+            prompt=self._section_prompt(section_name, context),
+            context=context,
+            word_limit=section["word_limit"],
+            complexity=section.get("complexity", "normal")
+        )
+
+    def _section_key(self, section_name: str, chunk_hashes: List[str]) -> str:
+        """Fingerprint of everything that determines a section's output"""
+        section = self.summary_prompts[section_name]
+        return SummaryCache.fingerprint(
+            SECTION_PROMPT_VERSION,
+            Config.LLM_BACKEND,
+            self.router.describe(section_name, section["word_limit"], section.get("complexity", "normal")),
+            section_name,
+            section["prompt"],
+            str(section["word_limit"]),
+            # Retrieval order follows similarity scores, which shift slightly as other
+            # documents are added; the set of chunks is what matters
+            sorted(chunk_hashes)
+        )
+
     def generate_two_page_summary(self) -> Dict[str, str]:
         """
         Generate comprehensive two-page summary with all sections.
@@ -239,34 +313,79 @@ class SummaryGenerator:
         logger.info("Generating two-page summary")
 
         summary_data = {}
-
-        # Process each section in parallel using threads
-        threads = []
-        results = {}
-
-        def process_section(section_name):
-            results[section_name] = self.generate_section_summary(section_name)
+        section_names = list(self.summary_prompts.keys())
+        contexts = {}
+        chunk_hashes = {}
 
         start_time = time.time()
 
-        # Create threads for each section
-        for section_name in self.summary_prompts.keys():
-            thread = threading.Thread(
-                target=process_section,
-                args=(section_name,),
-                name=f"Section-{section_name}"
-            )
-            threads.append(thread)
-            thread.start()
-
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        if self.map_reducer is not None:
+            # In map-reduce mode every section reads the same reduced filing summary
+            with span("map_reduce"):
+                shared_context = self.map_reducer.build_context()
+            contexts = {section_name: shared_context for section_name in section_names}
+            chunk_hashes = {section_name: [content_hash(shared_context)] for section_name in section_names}
+        else:
+            # Retrieve each section's context in parallel using threads
+            def retrieve_section(section_name):
+                try:
+                    contexts[section_name], chunk_hashes[section_name] = self._retrieve_context(section_name)
+                except Exception as e:
+                    logger.error(f"Failed to retrieve context for '{section_name}': {str(e)}")
+
+            threads = []
+            for section_name in section_names:
+                thread = threading.Thread(
+                    target=propagate(retrieve_section),
+                    args=(section_name,),
+                    name=f"Section-{section_name}"
+                )
+                threads.append(thread)
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        # Reuse sections whose retrieved chunks and prompt are unchanged since the last run
+        keys = {}
+        results = {}
+        for section_name in section_names:
+            if section_name not in contexts:
+                continue
+            keys[section_name] = self._section_key(section_name, chunk_hashes[section_name])
+            cached = self.section_cache.get(keys[section_name])
+            if cached is not None:
+                results[section_name] = cached
+        self.cache_stats["sections_reused"] = len(results)
+        logger.info(f"Reusing {len(results)} of {len(section_names)} section summaries with unchanged context")
+
+        # Route the remaining sections; each tier's prompts go out as one batch
+        stale = [section_name for section_name in keys if section_name not in results]
+        if stale:
+            answers = self.router.generate({
+                section_name: self._route_request(section_name, contexts[section_name]) for section_name in stale
+            })
+            for section_name, answer in answers.items():
+                results[section_name] = answer
+                if isinstance(answer, Exception):
+                    continue
+                self.section_cache.put(
+                    keys[section_name],
+                    results[section_name],
+                    section=section_name,
+                    prompt_version=SECTION_PROMPT_VERSION,
+                    chunk_hashes=sorted(chunk_hashes[section_name])
+                )
 
         # Collect results in proper order
-        for section_name in self.summary_prompts.keys():
+        for section_name in section_names:
             formatted_name = section_name.replace('_', ' ').title()
-            summary_data[formatted_name] = results[section_name]
+            response = results.get(section_name)
+            if response is None or isinstance(response, Exception):
+                logger.error(f"Failed to generate '{section_name}' summary: {str(response)}")
+                summary_data[formatted_name] = f"Error generating {section_name} summary."
+            else:
+                summary_data[formatted_name] = response
 
         total_time = time.time() - start_time
         logger.info(f"Generated two-page summary in {total_time:.2f} seconds")
@@ -294,33 +413,47 @@ class SummaryGenerator:
             for section_name, content in two_page_summary.items()
         ])
 
+        # Condense again only if some section changed since the last run
+        key = SummaryCache.fingerprint(
+            SECTION_PROMPT_VERSION, Config.LLM_BACKEND, self.router.describe("one_page_summary"),
+            ONE_PAGE_PROMPT, content_hash(combined_context)
+        )
+        cached = self.section_cache.get(key)
+        failed = any(content.startswith("Error generating") for content in two_page_summary.values())
+        if cached is not None and not failed:
+            logger.info("Reusing one-page summary: no section changed")
+            self.cache_stats["one_page_reused"] = True
+            self._create_docx_document(cached, "one_page_summary.docx")
+            return cached
+
         # Create condensed summary prompt
         condensed_prompt = PromptTemplate(
-            template="""
-            Using the detailed report sections below, create a executive summary that captures:
-
-            1. The company's primary business and financial position
-            2. Key performance highlights across segments
-            3. The most significant strengths, weaknesses, and future outlook
-            4. Credit Rating Info
-
-            Detailed Report:
-            {detailed_report}
-            """,
+            template=ONE_PAGE_PROMPT,
             input_variables=["detailed_report"]
         )
 
         try:
-            # Create and run chain
-            chain = LLMChain(llm=self.llm, prompt=condensed_prompt)
-
             start_time = time.time()
-            with get_openai_callback() as cb:
-                one_page_summary = chain.run(detailed_report=combined_context)
+            tokens_before = self.usage_tracker.total_tokens
+
+            one_page_summary = self.router.generate({
+                "one_page_summary": RouteRequest(
+                    prompt=condensed_prompt.format(detailed_report=combined_context),
+                    context=combined_context
+                )
+            })["one_page_summary"]
+            if isinstance(one_page_summary, Exception):
+                raise one_page_summary
 
             generation_time = time.time() - start_time
+            tokens_used = self.usage_tracker.total_tokens - tokens_before
 
-            logger.info(f"Generated one-page summary in {generation_time:.2f} seconds using {cb.total_tokens} tokens")
+            logger.info(f"Generated one-page summary in {generation_time:.2f} seconds using {tokens_used} tokens")
+
+            # A one-page summary built from failed sections is not worth keeping
+            if not failed:
+                self.section_cache.put(key, one_page_summary, section="one_page_summary",
+                                       prompt_version=SECTION_PROMPT_VERSION)
 
             # Create document
             self._create_docx_document(one_page_summary, "one_page_summary.docx")
@@ -331,65 +464,78 @@ class SummaryGenerator:
             logger.error(f"Failed to generate one-page summary: {str(e)}")
             return "Error generating one-page summary."
 
+    def get_run_stats(self) -> Dict:
+        """
+        Report throughput and cost per page for the summaries generated so far.
+
+        Returns:
+            Dict: Mode, backend, page count, elapsed seconds, tokens, cost and per-page rates
+        """
+        pages = {
+            (node.metadata.get("file_name"), node.metadata.get("page_label"))
+            for node in self.index.docstore.docs.values()
+        }
+        page_count = max(len(pages), 1)
+        elapsed = time.time() - self.run_started
+        tracker = self.usage_tracker
+
+        stats = {
+            "mode": self.mode,
+            "backend": tracker.backend,
+            "pages": len(pages),
+            "seconds": round(elapsed, 2),
+            "pages_per_minute": round(page_count / elapsed * 60, 2) if elapsed else 0.0,
+            "llm_calls": tracker.calls,
+            "total_tokens": tracker.total_tokens,
+            "completion_tokens": tracker.completion_tokens,
+            "tokens_per_second": round(tracker.completion_tokens / elapsed, 2) if elapsed else 0.0,
+            "total_cost": round(tracker.total_cost, 4),
+            "cost_per_page": round(tracker.total_cost / page_count, 5),
+            "sections_reused": self.cache_stats["sections_reused"],
+            "one_page_reused": self.cache_stats["one_page_reused"]
+        }
+        query_stats = self.query_cache.hit_rates()
+        stats.update({
+            "query_embedding_hit_rate": query_stats["embedding_hit_rate"],
+            "retrieval_hit_rate": query_stats["retrieval_hit_rate"],
+            # Calls, escalations, seconds and cost per model tier
+            "routing": self.router.stats()
+        })
+        if self.map_reducer is not None:
+            stats.update({
+                "map_groups": self.map_reducer.stats["groups"],
+                "map_calls": self.map_reducer.stats["map_calls"],
+                "map_cache_hits": self.map_reducer.stats["cache_hits"],
+                "map_failed_calls": self.map_reducer.stats["failed_calls"]
+            })
+        return stats
+
     def _create_docx_document(self, content, filename):
         """
         Create a well-formatted Word document from the summary content.
 
+        The DOCX is rendered from the prebuilt skeleton; the content is also saved
+        to summaries.json so other formats can be rendered on first download.
+
         Args:
             content: Summary content (dict for 2-page, string for 1-page)
             filename: Output filename
         """
         logger.info(f"Creating Word document: {filename}")
 
-        doc = DocxDocument()
-
-        # Set narrow margins: 0.5 inch = 914400 EMUs
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(0.4)
-            section.bottom_margin = Inches(0.4)
-            section.left_margin = Inches(0.4)
-            section.right_margin = Inches(0.4)
-
-        # Add a title
-        title = "Financial Summary Report"
-        title_para = doc.add_paragraph()
-        title_run = title_para.add_run(title)
-        title_run.bold = True
-        title_run.font.size = Pt(14)
-        title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # Add generated date
-        date_para = doc.add_paragraph()
-        date_run = date_para.add_run(f"Generated on: {datetime.now().strftime('%B %d, %Y')}")
-        date_run.italic = True
-        date_run.font.size = Pt(8)
-        date_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        if isinstance(content, dict):
-            # For 2-page summary (dictionary format)
-            for section_title, section_content in content.items():
-                if not section_content:  # Skip empty content
-                    continue
-
-                # Format section title
-                heading_para = doc.add_paragraph()
-                heading_run = heading_para.add_run(section_title)
-                heading_run.bold = True
-                heading_run.font.size = Pt(11)
-                heading_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-
-                # Add section content
-                content_para = doc.add_paragraph(section_content)
-                content_para.space_after = Pt(6)  # Reduced space after content
-
-
-        else:
-            content_para = doc.add_paragraph(content)
-
-        # Save the document
+        start_time = time.time()
         output_path = os.path.join(self.output_dir, filename)
-        doc.save(output_path)
-        logger.info(f"Saved document to {output_path}")
-        if not os.path.exists(output_path):
-            raise FileNotFoundError(f"Failed to create {filename}")
\ No newline at end of file
+        with span("render_docx", file=filename), open(output_path, "wb") as f:
+            f.write(render_docx(content, self.generated_on))
+        logger.info(f"Saved document to {output_path} in {time.time() - start_time:.3f} seconds")
+
+        # Record the content for lazy Markdown/HTML/PDF rendering
+        summaries_path = os.path.join(self.output_dir, SUMMARIES_FILE)
+        summaries = {"generated_on": self.generated_on, "summaries": {}}
+        if os.path.exists(summaries_path):
+            with open(summaries_path, "r", encoding="utf-8") as f:
+                summaries = json.load(f)
+        summaries["generated_on"] = self.generated_on
+        summaries["summaries"][os.path.splitext(filename)[0]] = content
+        with open(summaries_path, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
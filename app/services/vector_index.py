@@ -0,0 +1,61 @@
+import logging
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# Vector encodings, from largest to smallest:
+#   flat: float32 (4 bytes/dim)          fp16: float16 scalar quantizer (2 bytes/dim)
+#   sq8: 8-bit scalar quantizer (1 byte/dim)   pq: product quantizer (pq_subquantizers bytes/vector)
+INDEX_TYPES = ("flat", "fp16", "sq8", "pq")
+
+HNSW_NEIGHBORS = 32
+# k-means needs ~39 points per centroid for 256 centroids per sub-quantizer
+PQ_MIN_TRAINING_VECTORS = 256 * 39
+
+
+def create_faiss_index(index_type: str, training_vectors: np.ndarray,
+                       pq_subquantizers: int = 48, ef_search: int = 64) -> faiss.Index:
+    """
+    Create an empty (trained) HNSW index whose vectors use the given encoding.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        training_vectors: float32 array (n, dimension) used to train quantizers
+        pq_subquantizers: Number of PQ sub-quantizers; must divide the dimension
+        ef_search: HNSW search breadth; quantized codes need a wider search for the same recall
+
+    Returns:
+        faiss.Index: Trained index, ready for add()
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+    vectors = np.ascontiguousarray(training_vectors, dtype="float32")
+    if vectors.ndim != 2 or len(vectors) == 0:
+        raise ValueError("Cannot create a vector index without vectors")
+    dimension = vectors.shape[1]
+
+    if index_type == "pq" and len(vectors) < PQ_MIN_TRAINING_VECTORS:
+        logger.warning(f"Only {len(vectors)} vectors, PQ needs {PQ_MIN_TRAINING_VECTORS} to train; using sq8")
+        index_type = "sq8"
+
+    if index_type == "flat":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_NEIGHBORS)
+    elif index_type == "fp16":
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, HNSW_NEIGHBORS)
+    elif index_type == "sq8":
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_NEIGHBORS)
+    else:
+        index = faiss.IndexHNSWPQ(dimension, pq_subquantizers, HNSW_NEIGHBORS)
+
+    if not index.is_trained:
+        index.train(vectors)
+
+    index.hnsw.efSearch = ef_search
+    return index
+
+
+def index_size_bytes(index: faiss.Index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory"""
+    return int(faiss.serialize_index(index).nbytes)
@@ -41,9 +41,21 @@ $(document).ready(function() {
             selectedFiles.hide().fadeIn(300);
         }
     }
+    // Job returned by the last successful upload; downloads and evaluation are scoped to it
+    let currentJob = null;
+
     $('#uploadForm').submit(function(e) {
         e.preventDefault();
         const formData = new FormData(this);
+
+        // Evaluation needs the job this upload creates
+        currentJob = null;
+        $('#runEvaluation').prop('disabled', true);
+
+        // The job id is chosen here so /status/<job_id> can be polled while the upload is processed
+        const jobId = Array.from(crypto.getRandomValues(new Uint8Array(16)),
+                                 b => b.toString(16).padStart(2, '0')).join('');
+        let jobStatusSeen = false;
         
         // UI Initial State
         const $submitBtn = $('button[type="submit"]');
@@ -114,7 +126,7 @@ $(document).ready(function() {
                     updateCircularProgress(progress);
                     
                     // Occasionally show processing details for realism
-                    if (Math.random() < 0.15) { // 15% chance on each micro-update
+                    if (!jobStatusSeen && Math.random() < 0.15) { // 15% chance on each micro-update
                         showProcessingDetail(processingDetails[processingDetailsIndex]);
                         processingDetailsIndex = (processingDetailsIndex + 1) % processingDetails.length;
                     }
@@ -137,9 +149,11 @@ $(document).ready(function() {
                 
                 currentMessageIndex++;
                 
-                // Show a processing detail with each major step
-                showProcessingDetail(processingDetails[processingDetailsIndex]);
-                processingDetailsIndex = (processingDetailsIndex + 1) % processingDetails.length;
+                // Show a processing detail with each major step, until the server reports real progress
+                if (!jobStatusSeen) {
+                    showProcessingDetail(processingDetails[processingDetailsIndex]);
+                    processingDetailsIndex = (processingDetailsIndex + 1) % processingDetails.length;
+                }
             }
         }, totalTime / progressMessages.length);
     
@@ -180,16 +194,42 @@ $(document).ready(function() {
             });
         };
     
+        // Job stage and per-file extraction progress reported by the server
+        const escapeHtml = (text) => $('<div>').text(text).html();
+        const showJobStatus = (state) => {
+            jobStatusSeen = true;
+            const files = Object.entries(state.files || {}).map(([name, file]) =>
+                `${escapeHtml(name)} ${file.pages_done}/${file.pages_total} pages`);
+            const stage = state.stage.charAt(0).toUpperCase() + state.stage.slice(1);
+            showProcessingDetail(files.length && state.stage === 'ingesting'
+                ? `${stage}: ${files.join(', ')}` : `${stage}...`);
+        };
+        const statusInterval = setInterval(() => {
+            // 404 until the upload has been received and processing starts
+            $.getJSON(`/status/${jobId}`).done(showJobStatus);
+        }, 2000);
+
         // AJAX Request
         $.ajax({
             url: '/',
             type: 'POST',
             data: formData,
+            headers: { 'X-Job-Id': jobId },
             processData: false,
             contentType: false,
             success: (response) => {
                 clearInterval(microProgressInterval);
                 clearInterval(majorProgressInterval);
+                clearInterval(statusInterval);
+
+                if (response.job_id) {
+                    currentJob = response;
+                    $('#runEvaluation').prop('disabled', false);
+                    $('a[data-summary][data-format]').each(function() {
+                        const filename = `${$(this).data('summary')}.${$(this).data('format')}`;
+                        $(this).attr('href', `/download/${response.job_id}/${filename}`);
+                    });
+                }
                 
                 // Ensure we reach 100% smoothly
                 const completeProgress = () => {
@@ -293,6 +333,7 @@ $(document).ready(function() {
             error: (xhr) => {
                 clearInterval(microProgressInterval);
                 clearInterval(majorProgressInterval);
+                clearInterval(statusInterval);
                 
                 // Enhanced error handling with more dramatic visual feedback
                 const errorAnimation = () => {
@@ -353,6 +394,10 @@ $(document).ready(function() {
 
     // Evaluation with enhanced UX
     $('#runEvaluation').click(function() {
+        if (!currentJob) {
+            return;
+        }
+
         // Update stepper
         $('#summaryStep').addClass('completed');
         $('#evaluateStep').addClass('active');
@@ -364,7 +409,7 @@ $(document).ready(function() {
         $('.eval-card').addClass('pulse-light');
 
         $.ajax({
-            url: '/evaluate',
+            url: currentJob.evaluate,
             type: 'GET',
             success: function(response) {
                 // Enhanced progress effect before showing results
@@ -451,7 +496,7 @@ $(document).ready(function() {
             },
             complete: function() {
                 $('#evalSpinner').addClass('d-none');
-                $('#runEvaluation').prop('disabled', false);
+                $('#runEvaluation').prop('disabled', !currentJob);
             }
         });
         
@@ -0,0 +1,29 @@
+import os
+import tempfile
+from typing import Union
+
+
+def write_atomic(path: str, data: Union[str, bytes]) -> None:
+    """
+    Write a file so concurrent readers see either the old or the new contents, never a partial file.
+
+    The data goes to a uniquely named temporary file in the same directory, which
+    then replaces the target. mkstemp names never collide, unlike names built from
+    thread idents, which repeat across forked web workers.
+
+    Args:
+        path: Destination file
+        data: Text (written as UTF-8) or bytes
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
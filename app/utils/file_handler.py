@@ -1,22 +1,35 @@
 # app/utils/file_handler.py
 import os
+import hashlib
 import logging
 from werkzeug.utils import secure_filename
-from typing import List, Optional
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NeedData
+from typing import BinaryIO, List, NamedTuple, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+PDF_MAGIC = b'%PDF-'
+
+
+class SavedFile(NamedTuple):
+    """An uploaded file written to disk, with its content hash for deduplication"""
+    path: str
+    sha256: str
+    size: int
+
 class FileHandler:
     """Secure file handler without workspace clearance"""
     
     def __init__(self, 
                  upload_folder: str = "uploads",
                  allowed_extensions: Optional[List[str]] = None,
-                 max_file_size: int = 50 * 1024 * 1024):
+                 max_file_size: int = 50 * 1024 * 1024,
+                 chunk_size: int = 64 * 1024):
         self.upload_folder = upload_folder
         self.allowed_extensions = allowed_extensions or ['pdf']
         self.max_file_size = max_file_size
+        self.chunk_size = chunk_size
         self._ensure_directory_exists(upload_folder)
 
     def _ensure_directory_exists(self, path: str) -> None:
@@ -41,6 +54,67 @@ class FileHandler:
                 logger.error(f"Failed to save {filename}: {str(e)}")
         return saved_paths
 
+    def save_streamed_files(self, stream: BinaryIO, boundary: bytes) -> List[SavedFile]:
+        """
+        Save PDFs from a raw multipart/form-data body without buffering it.
+
+        Each file part is written to disk in fixed-size chunks while its SHA-256
+        is computed. A part is dropped as soon as it exceeds max_file_size or
+        its first bytes are not the %PDF magic; identical files are saved once.
+
+        Args:
+            stream: Request body stream (e.g. Flask's request.stream)
+            boundary: Multipart boundary from the Content-Type header
+
+        Returns:
+            List[SavedFile]: Saved files in upload order
+        """
+        self._ensure_directory_exists(self.upload_folder)
+
+        decoder = MultipartDecoder(boundary)
+        saved = []
+        seen_hashes = set()
+        part = None
+
+        try:
+            finished = False
+            while not finished:
+                chunk = stream.read(self.chunk_size)
+                decoder.receive_data(chunk or None)
+
+                event = decoder.next_event()
+                while not isinstance(event, NeedData):
+                    if isinstance(event, Epilogue):
+                        finished = True
+                        break
+                    if isinstance(event, File):
+                        part = _StreamedPart(self, event.filename)
+                    elif isinstance(event, Data):
+                        if part is not None:
+                            part.write(event.data)
+                            if not event.more_data:
+                                record = part.finish(seen_hashes)
+                                if record:
+                                    seen_hashes.add(record.sha256)
+                                    saved.append(record)
+                                part = None
+                    else:
+                        # Form fields and preamble are not used
+                        part = None
+                    event = decoder.next_event()
+
+                if not chunk and not finished:
+                    raise ValueError("Multipart body ended before the closing boundary")
+        except Exception as e:
+            logger.error(f"Streaming upload failed: {str(e)}")
+            if part is not None:
+                part.discard()
+            for record in saved:
+                os.remove(record.path)
+            raise
+
+        return saved
+
     # Keep the validation methods unchanged
     def _is_valid_file(self, file, filename: str) -> bool:
         return all([
@@ -71,4 +145,82 @@ class FileHandler:
     def validate_filename(self, filename: str) -> bool:
         safe_filename = secure_filename(filename)
         path = os.path.join(self.upload_folder, safe_filename)
-        return os.path.isfile(path) and safe_filename == filename
\ No newline at end of file
+        return os.path.isfile(path) and safe_filename == filename
+
+
+class _StreamedPart:
+    """Write state for one file part of a streamed multipart upload"""
+
+    def __init__(self, handler: FileHandler, filename: str):
+        self.handler = handler
+        self.filename = secure_filename(filename or '')
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.file = None
+        self.tmp_path = None
+        self.rejected = False
+
+        if not self.filename:
+            self.rejected = True
+        elif not handler._allowed_filename(self.filename) or handler._is_executable(self.filename):
+            self._reject("extension not allowed")
+        else:
+            self.tmp_path = os.path.join(handler.upload_folder, f".{self.filename}.{id(self)}.part")
+            self.file = open(self.tmp_path, 'wb')
+
+    def write(self, data: bytes) -> None:
+        if self.rejected or not data:
+            return
+
+        self.size += len(data)
+        if self.size > self.handler.max_file_size:
+            self._reject(f"exceeds {self.handler.max_file_size} bytes")
+            return
+
+        # The magic may straddle chunk boundaries, so hold back bytes until it is complete
+        if len(self.head) < len(PDF_MAGIC):
+            self.head += data
+            if len(self.head) < len(PDF_MAGIC):
+                return
+            if not self.head.startswith(PDF_MAGIC):
+                self._reject("not a PDF")
+                return
+            data, self.head = self.head, self.head[:len(PDF_MAGIC)]
+
+        self.hasher.update(data)
+        self.file.write(data)
+
+    def finish(self, seen_hashes) -> Optional[SavedFile]:
+        if self.rejected:
+            return None
+        if len(self.head) < len(PDF_MAGIC):
+            self._reject("not a PDF")
+            return None
+
+        self.file.close()
+        sha256 = self.hasher.hexdigest()
+        if sha256 in seen_hashes:
+            logger.info(f"Skipped duplicate upload: {self.filename}")
+            self.discard()
+            return None
+
+        save_path = self.handler._get_unique_path(self.filename)
+        if os.path.exists(save_path):
+            base, ext = os.path.splitext(save_path)
+            save_path = f"{base}_{sha256[:8]}{ext}"
+        os.replace(self.tmp_path, save_path)
+
+        logger.info(f"Saved: {save_path} ({self.size} bytes, sha256 {sha256[:12]})")
+        return SavedFile(save_path, sha256, self.size)
+
+    def discard(self) -> None:
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def _reject(self, reason: str) -> None:
+        logger.warning(f"Rejected upload {self.filename}: {reason}")
+        self.rejected = True
+        self.discard()
@@ -0,0 +1,50 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from app.utils.atomic_write import write_atomic
+
+logger = logging.getLogger(__name__)
+
+STATUS_FILE = "status.json"
+
+
+class JobStatus:
+    """
+    Progress of one summarization job, written to OUTPUT_DIR/<job_id>/status.json
+    so other requests (GET /status/<job_id>) can poll it while the job runs.
+    """
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, STATUS_FILE)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.state = {"stage": "queued", "files": {}, "elapsed_seconds": 0.0}
+
+    def set_stage(self, stage: str, **details) -> None:
+        with self._lock:
+            self.state.update(details, stage=stage)
+            self._write()
+
+    def file_progress(self, file_name: str, pages_done: int, pages_total: int) -> None:
+        with self._lock:
+            self.state["files"][file_name] = {"pages_done": pages_done, "pages_total": pages_total}
+            self._write()
+
+    def _write(self) -> None:
+        self.state["elapsed_seconds"] = round(time.time() - self.started_at, 2)
+        try:
+            write_atomic(self.path, json.dumps(self.state))
+        except OSError as e:
+            logger.warning(f"Could not write job status {self.path}: {str(e)}")
+
+
+def read_status(output_dir: str) -> Optional[Dict]:
+    """Last status written for a job, or None if it has not started"""
+    try:
+        with open(os.path.join(output_dir, STATUS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
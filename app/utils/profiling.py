@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import functools
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Files written next to the job outputs, downloadable through /download/<job_id>/<file>
+FOLDED_FILE = "profile.folded"
+CPROFILE_FILE = "profile.prof"
+SPANS_FILE = "spans.json"
+PROFILE_FILES = (FOLDED_FILE, CPROFILE_FILE, SPANS_FILE)
+
+# Profiler of the job running in this context, and the innermost open span
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoSpan:
+    """Shared no-op returned by span() when no job is being profiled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """
+    Time a block as a node of the job's span tree.
+
+    Costs one context variable lookup when profiling is off.
+
+    Args:
+        name: Span name, e.g. "create_index"
+        attrs: JSON-serializable details shown with the span
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return _NO_SPAN
+    return profiler.span(name, **attrs)
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Wrap a function handed to another thread so its spans attach to the caller's span.
+
+    Call once per task: a copied context can only be entered by one thread at a time.
+    """
+    if _active_profiler.get() is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class JobProfiler:
+    """
+    Profiles one job: a wall-clock span tree, a cProfile of the calling thread and
+    sampled stacks of every thread the job starts, as folded stacks for flamegraphs
+    (flamegraph.pl, speedscope). Threads that other requests start in the same worker
+    while the job runs are sampled too.
+    """
+
+    def __init__(self, output_dir: str, sample_interval: float = 0.005):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir: Job output directory that receives PROFILE_FILES
+            sample_interval: Seconds between stack samples
+        """
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self.root = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._cprofile = None
+        self._token = None
+        self._ignored_threads = set()
+        self._started = 0.0
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        node = {
+            "name": name,
+            "attrs": attrs,
+            "thread": threading.current_thread().name,
+            "start": round(time.perf_counter() - self._started, 6),
+            "seconds": None,
+            "children": []
+        }
+        parent = _current_span.get()
+        with self._lock:
+            if parent is not None:
+                parent["children"].append(node)
+            elif self.root is None:
+                self.root = node
+        token = _current_span.set(node)
+        started = time.perf_counter()
+        try:
+            yield node
+        finally:
+            node["seconds"] = round(time.perf_counter() - started, 6)
+            _current_span.reset(token)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._token = _active_profiler.set(self)
+
+        # Threads that already exist belong to the server or other requests
+        self._ignored_threads = {thread.ident for thread in threading.enumerate()}
+        self._ignored_threads.discard(threading.get_ident())
+        self._sampler = threading.Thread(target=self._sample, name="JobProfiler-sampler", daemon=True)
+        self._sampler.start()
+
+        self._cprofile = cProfile.Profile()
+        try:
+            self._cprofile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one active profiler per process: a concurrent profiled
+            # job in this worker keeps it, and this job only gets spans and samples
+            logger.warning(f"cProfile unavailable, saving spans and samples only: {str(e)}")
+            self._cprofile = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self._stop.set()
+        self._sampler.join()
+        _active_profiler.reset(self._token)
+
+        try:
+            self._write()
+        except OSError as e:
+            logger.error(f"Failed to write profile to {self.output_dir}: {str(e)}")
+        return False
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or ident in self._ignored_threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def _write(self):
+        with open(os.path.join(self.output_dir, FOLDED_FILE), "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.join(self.output_dir, CPROFILE_FILE))
+
+        with open(os.path.join(self.output_dir, SPANS_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "total_seconds": round(time.perf_counter() - self._started, 6),
+                "sample_interval": self.sample_interval,
+                "samples": self.sample_count,
+                "spans": self.root
+            }, f, indent=2)
+
+        logger.info(f"Saved profile ({self.sample_count} samples) to {self.output_dir}")
+
+    def summary(self) -> Optional[Dict]:
+        """Top-level span timings, e.g. for logs"""
+        if self.root is None:
+            return None
+        return {child["name"]: child["seconds"] for child in self.root["children"]}
@@ -0,0 +1,113 @@
+import time
+import logging
+import importlib
+import threading
+import multiprocessing
+from typing import Dict, Optional
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Modules that pull in torch, llama_index, faiss, langchain, ragas and pandas
+HEAVY_MODULES = (
+    "app.services.financial_processor",
+    "app.services.raga_evaluator"
+)
+
+_lock = threading.Lock()
+_state = {
+    # lazy: no warm-up requested, models load on first use
+    "status": "lazy",
+    "process_started_at": time.time(),
+    "preload_seconds": None,
+    "warmup_seconds": None,
+    "first_request_seconds": None,
+    "error": None
+}
+
+
+def mark_process_start(started_at: float) -> None:
+    """Use the launcher's start time as the reference for cold-start measurements"""
+    with _lock:
+        _state["process_started_at"] = started_at
+
+
+def preload() -> None:
+    """
+    Import heavy modules and load the embedding model.
+
+    Called in the master process before forking so workers share the result.
+    Inference is left to warm_worker(): running torch before fork can leave
+    OpenMP thread pools unusable in the children.
+    """
+    _set(status="preloading")
+    start = time.time()
+    try:
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+
+        from .services.embeddings import get_embed_model
+        get_embed_model(Config.EMBEDDING_MODEL)
+
+        _set(status="preloaded", preload_seconds=round(time.time() - start, 2))
+        logger.info(f"Preloaded models in {time.time() - start:.2f} seconds")
+    except Exception as e:
+        _set(status="failed", error=str(e))
+        logger.error(f"Preload failed: {str(e)}", exc_info=True)
+
+
+def warm_worker() -> None:
+    """Run one embedding so per-process thread pools and caches are initialized"""
+    if _state["preload_seconds"] is None:
+        preload()
+        if _state["status"] == "failed":
+            return
+
+    _set(status="warming")
+    start = time.time()
+    try:
+        from .services.embeddings import get_embed_model
+        get_embed_model(Config.EMBEDDING_MODEL).get_text_embedding("warm-up")
+
+        _set(status="ready", warmup_seconds=round(time.time() - start, 2))
+        logger.info(f"Worker warm-up finished in {time.time() - start:.2f} seconds")
+    except Exception as e:
+        _set(status="failed", error=str(e))
+        logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+
+
+def start_worker_warmup() -> Optional[threading.Thread]:
+    """Warm up in a background thread so the worker can accept requests immediately"""
+    if multiprocessing.parent_process() is not None:
+        # A multiprocessing child (e.g. a spawned PDF extraction worker re-importing
+        # __main__) never serves requests, so it must not load the heavy stack
+        return None
+    _set(status="warming")
+    thread = threading.Thread(target=warm_worker, name="Warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def record_first_request() -> Optional[float]:
+    """Record cold-start time the first time this process serves a request"""
+    with _lock:
+        if _state["first_request_seconds"] is not None:
+            return None
+        elapsed = round(time.time() - _state["process_started_at"], 2)
+        _state["first_request_seconds"] = elapsed
+    logger.info(f"Cold start to first served request: {elapsed:.2f} seconds")
+    return elapsed
+
+
+def is_ready() -> bool:
+    return _state["status"] in ("lazy", "ready")
+
+
+def status() -> Dict:
+    with _lock:
+        return dict(_state)
+
+
+def _set(**values) -> None:
+    with _lock:
+        _state.update(values)
@@ -0,0 +1,451 @@
+"""
+Benchmarks for the summarization pipeline.
+
+Usage:
+    python benchmark.py summarize --input path/to/pdfs [--modes retrieval map_reduce]
+    python benchmark.py backends --input path/to/pdfs [--backends openai openai_compatible llamacpp]
+    python benchmark.py render [--iterations 50]
+    python benchmark.py coldstart [--workers 2]
+    python benchmark.py startup
+    python benchmark.py quantization [--vectors 20000 --k 6]
+    python benchmark.py ingest [--input path/to/pdfs] [--workers 1 4 8]
+    python benchmark.py routing [--log instance/logs/model_routing.jsonl]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import time
+import socket
+import signal
+import logging
+import subprocess
+import urllib.request
+import urllib.error
+
+from app.config import Config
+
+
+# Cache settings pointed at each run's work directory
+CACHE_SETTINGS = {
+    'SECTION_CACHE_DIR': os.path.join('cache', 'sections'),
+    'MAP_SUMMARY_CACHE_DIR': os.path.join('cache', 'map_summaries'),
+    'QUERY_CACHE_PATH': os.path.join('cache', 'queries.sqlite3')
+}
+
+
+def _process_copy(input_dir, summary_mode='retrieval'):
+    """
+    Run the full pipeline on a temporary copy of the PDFs and return its run stats.
+
+    Each run starts with empty section, map-summary and query caches; reusing the
+    persistent ones would skip every LLM call on a second run of the same PDFs.
+    """
+    from app.services.financial_processor import FinancialDocumentProcessor
+
+    pdfs = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
+    if not pdfs:
+        sys.exit(f"No PDF files found in {input_dir}")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    saved_settings = {name: getattr(Config, name) for name in CACHE_SETTINGS}
+    try:
+        for name, path in CACHE_SETTINGS.items():
+            setattr(Config, name, os.path.join(work_dir, path))
+
+        upload_dir = os.path.join(work_dir, 'uploads')
+        output_dir = os.path.join(work_dir, 'output')
+        os.makedirs(upload_dir)
+        os.makedirs(output_dir)
+        for pdf in pdfs:
+            shutil.copy(os.path.join(input_dir, pdf), upload_dir)
+
+        processor = FinancialDocumentProcessor(
+            upload_dir,
+            output_dir,
+            Config.OPENAI_API_KEY,
+            summary_mode=summary_mode
+        )
+        if not processor.process_documents():
+            return None
+        return processor.run_stats
+    finally:
+        for name, value in saved_settings.items():
+            setattr(Config, name, value)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _print_table(results, columns):
+    print(' | '.join(f"{c:>17}" for c in columns))
+    for stats in results:
+        print(' | '.join(f"{str(stats.get(c, '')):>17}" for c in columns))
+
+
+def bench_summarize(args):
+    """Compare throughput and cost per page between summary modes on the same PDFs"""
+    results = []
+    for mode in args.modes:
+        stats = _process_copy(args.input, summary_mode=mode)
+        if stats is None:
+            print(f"{mode}: processing failed", file=sys.stderr)
+            continue
+        results.append(stats)
+
+    _print_table(results, ['mode', 'pages', 'seconds', 'pages_per_minute',
+                           'total_tokens', 'total_cost', 'cost_per_page'])
+    return results
+
+
+def bench_backends(args):
+    """Compare generation throughput and end-to-end report latency between LLM backends"""
+    results = []
+    for backend in args.backends:
+        Config.LLM_BACKEND = backend
+        stats = _process_copy(args.input)
+        if stats is None:
+            print(f"{backend}: processing failed", file=sys.stderr)
+            continue
+        results.append(stats)
+
+    _print_table(results, ['backend', 'seconds', 'llm_calls', 'completion_tokens',
+                           'tokens_per_second', 'total_cost'])
+    return results
+
+
+def _python_docx_baseline(content, generated_on):
+    """Object-model rendering with python-docx, for comparison with the skeleton renderer"""
+    import io
+    from docx import Document
+    from docx.shared import Pt
+
+    doc = Document()
+    doc.add_paragraph().add_run("Financial Summary Report").font.size = Pt(14)
+    doc.add_paragraph().add_run(f"Generated on: {generated_on}").font.size = Pt(8)
+    for section_title, section_content in content.items():
+        doc.add_paragraph().add_run(section_title).bold = True
+        doc.add_paragraph(section_content)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def bench_render(args):
+    """Measure rendering time per report for each output format"""
+    from app.services.report_renderer import RENDERERS
+
+    paragraph = ("Revenue grew 8.1% year over year to $94.8 billion, driven by Services "
+                 "($20.9 billion, +5.5%) while Greater China declined 2.9%. ")
+    content = {f"Section {i}": paragraph * 6 for i in range(1, 7)}
+    generated_on = "January 01, 2025"
+
+    renderers = dict(RENDERERS)
+    try:
+        import docx  # noqa: F401
+        renderers['docx (python-docx)'] = _python_docx_baseline
+    except ImportError:
+        pass
+
+    results = []
+    for fmt, render in renderers.items():
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            render(content, generated_on)
+        elapsed = time.perf_counter() - start
+        results.append({'format': fmt, 'ms_per_report': round(elapsed / args.iterations * 1000, 3)})
+
+    _print_table(results, ['format', 'ms_per_report'])
+    return results
+
+
+def _wait_for(url, deadline, accept=(200,)):
+    """Poll url until it returns an accepted status; returns the time it did, or None"""
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status in accept:
+                    return time.time()
+        except urllib.error.HTTPError as e:
+            if e.code in accept:
+                return time.time()
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.1)
+    return None
+
+
+def bench_coldstart(args):
+    """Measure cold start of serve.py: launch to first served request and to readiness"""
+    results = []
+    for preload in ('1', '0'):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        env = dict(os.environ, WEB_BIND=f'127.0.0.1:{port}', WEB_PRELOAD=preload,
+                   WEB_WORKERS=str(args.workers))
+        started = time.time()
+        server = subprocess.Popen([sys.executable, 'serve.py'], env=env, start_new_session=True,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = started + args.timeout
+            first_request = _wait_for(f'http://127.0.0.1:{port}/', deadline)
+            ready = _wait_for(f'http://127.0.0.1:{port}/ready', deadline)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+
+        results.append({
+            'preload': preload == '1',
+            'first_request_seconds': round(first_request - started, 2) if first_request else None,
+            'ready_seconds': round(ready - started, 2) if ready else None
+        })
+
+    _print_table(results, ['preload', 'first_request_seconds', 'ready_seconds'])
+    return results
+
+
+# Which modules startup may import is checked by tests/test_startup.py
+STARTUP_SCRIPT = """
+from app import create_app
+client = create_app().test_client()
+client.get('/')
+client.get('/ready')
+"""
+
+
+def bench_startup(args):
+    """Import-time profile of create_app() plus GET / and /ready (python -X importtime)"""
+    env = dict(os.environ, WARMUP_IN_BACKGROUND='0')
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                               env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        sys.exit(completed.stderr[-2000:])
+
+    # Lines look like "import time:       123 |       4567 |   package.module"
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        imports.append((name, int(self_us), int(cumulative_us)))
+
+    result = {
+        'wall_seconds': round(wall, 3),
+        'import_ms': round(sum(self_us for _, self_us, _ in imports) / 1000, 1),
+        'modules_imported': len(imports),
+        'slowest_imports': [
+            {'module': name, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+            for name, _, cumulative_us in sorted(imports, key=lambda i: -i[2])[:args.top]
+        ]
+    }
+
+    print(f"startup wall time: {result['wall_seconds']} s, imports: {result['import_ms']} ms "
+          f"({result['modules_imported']} modules)")
+    _print_table(result['slowest_imports'], ['module', 'cumulative_ms'])
+    return result
+
+
+def bench_quantization(args):
+    """Bytes per node, index RAM and recall@k of each vector encoding against exact float32 search"""
+    import numpy as np
+    import faiss
+    from app.services.vector_index import INDEX_TYPES, create_faiss_index, index_size_bytes
+
+    # Clustered, normalized vectors shaped like sentence embeddings
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.vectors // 100, 1), args.dimension))
+    vectors = centers[rng.integers(0, len(centers), args.vectors)]
+    vectors = (vectors + 0.6 * rng.standard_normal(vectors.shape)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype('float32')
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = create_faiss_index(index_type, vectors, pq_subquantizers=args.pq_subquantizers,
+                                   ef_search=Config.HNSW_EF_SEARCH)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        search_ms = (time.perf_counter() - start) / args.queries * 1000
+
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        size = index_size_bytes(index)
+        results.append({
+            'index_type': index_type,
+            'bytes_per_node': round(size / args.vectors, 1),
+            'index_ram_mb': round(size / 1e6, 2),
+            f'recall@{args.k}': round(float(recall), 4),
+            'build_seconds': round(build_seconds, 2),
+            'search_ms': round(search_ms, 3)
+        })
+        del index
+
+    _print_table(results, ['index_type', 'bytes_per_node', 'index_ram_mb',
+                           f'recall@{args.k}', 'build_seconds', 'search_ms'])
+    return results
+
+
+def _synthetic_filings(directory, files, pages):
+    """Write text PDFs shaped like filings (about 45 lines of prose per page)"""
+    from app.services.report_renderer import render_pdf
+
+    paragraph = ("Revenue grew 8.1% year over year to $94.8 billion, driven by Services "
+                 "($20.9 billion, +5.5%) while Greater China declined 2.9%. ")
+    for i in range(files):
+        content = {f"Item {page}": paragraph * 24 for page in range(1, pages + 1)}
+        with open(os.path.join(directory, f"filing_{i}.pdf"), 'wb') as f:
+            f.write(render_pdf(content, "January 01, 2025"))
+
+
+def bench_ingest(args):
+    """PDF text extraction time per worker count, and speedup over serial extraction"""
+    from app.services.pdf_extraction import plan_tasks, extract_parallel, shutdown_pool
+
+    work_dir = None
+    input_dir = args.input
+    if input_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="bench_")
+        input_dir = work_dir
+        _synthetic_filings(input_dir, args.files, args.pages)
+
+    try:
+        paths = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf'))
+        if not paths:
+            sys.exit(f"No PDF files found in {input_dir}")
+        tasks = plan_tasks(paths, args.pages_per_task)
+        page_count = sum(task.end - task.start for task in tasks)
+
+        results = []
+        for workers in args.workers:
+            # Start the pool outside the timed run; the app keeps it between requests
+            list(extract_parallel(tasks[:2], workers))
+
+            start = time.perf_counter()
+            extracted = sum(len(pages) for _, pages in extract_parallel(tasks, workers))
+            elapsed = time.perf_counter() - start
+            shutdown_pool()
+
+            assert extracted == page_count
+            serial = results[0]['seconds'] if results else elapsed
+            results.append({
+                'workers': workers,
+                'files': len(paths),
+                'pages': page_count,
+                'seconds': round(elapsed, 3),
+                'pages_per_second': round(page_count / elapsed, 1),
+                'speedup': round(serial / elapsed, 2)
+            })
+
+        print(f"{os.cpu_count()} CPU cores, {len(tasks)} tasks of up to {args.pages_per_task} pages")
+        _print_table(results, ['workers', 'files', 'pages', 'seconds', 'pages_per_second', 'speedup'])
+        return results
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_routing(args):
+    """Per-section latency, cost and escalation rate per model tier, from the routing log"""
+    if not os.path.exists(args.log):
+        sys.exit(f"No routing log at {args.log}; run some summaries first")
+
+    groups = {}
+    with open(args.log, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            groups.setdefault((record['name'], record['tier'], record['model']), []).append(record)
+
+    results = []
+    for (name, tier, model), records in sorted(groups.items()):
+        seconds = sorted(record['seconds'] for record in records)
+        results.append({
+            'section': name,
+            'tier': tier,
+            'model': model,
+            'calls': len(records),
+            'escalation_rate': round(sum(record['escalated'] for record in records) / len(records), 3),
+            'p50_seconds': seconds[len(seconds) // 2],
+            'mean_cost': round(sum(record['cost'] for record in records) / len(records), 5),
+            'mean_tokens': round(sum(record['prompt_tokens'] + record['completion_tokens']
+                                     for record in records) / len(records))
+        })
+
+    _print_table(results, ['section', 'tier', 'model', 'calls', 'escalation_rate',
+                           'p50_seconds', 'mean_cost', 'mean_tokens'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', help="Write results to this JSON file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summarize = subparsers.add_parser('summarize', help="Compare summary modes")
+    summarize.add_argument('--input', required=True, help="Directory containing PDF filings")
+    summarize.add_argument('--modes', nargs='+', default=['retrieval', 'map_reduce'],
+                           choices=['retrieval', 'map_reduce'])
+    summarize.set_defaults(func=bench_summarize)
+
+    backends = subparsers.add_parser('backends', help="Compare LLM backends")
+    backends.add_argument('--input', required=True, help="Directory containing PDF filings")
+    backends.add_argument('--backends', nargs='+', default=['openai', 'openai_compatible', 'llamacpp'],
+                          choices=['openai', 'openai_compatible', 'llamacpp'])
+    backends.set_defaults(func=bench_backends)
+
+    render = subparsers.add_parser('render', help="Measure rendering time per report")
+    render.add_argument('--iterations', type=int, default=50)
+    render.set_defaults(func=bench_render)
+
+    coldstart = subparsers.add_parser('coldstart', help="Measure serve.py cold start")
+    coldstart.add_argument('--workers', type=int, default=Config.WEB_WORKERS)
+    coldstart.add_argument('--timeout', type=float, default=300)
+    coldstart.set_defaults(func=bench_coldstart)
+
+    startup = subparsers.add_parser('startup', help="Import-time profile of app startup")
+    startup.add_argument('--top', type=int, default=15)
+    startup.set_defaults(func=bench_startup)
+
+    quantization = subparsers.add_parser('quantization', help="Compare FAISS vector encodings")
+    quantization.add_argument('--vectors', type=int, default=20000)
+    quantization.add_argument('--queries', type=int, default=200)
+    quantization.add_argument('--dimension', type=int, default=384)
+    quantization.add_argument('--k', type=int, default=6)
+    quantization.add_argument('--pq-subquantizers', type=int, default=Config.PQ_SUBQUANTIZERS)
+    quantization.set_defaults(func=bench_quantization)
+
+    ingest = subparsers.add_parser('ingest', help="Compare PDF extraction worker counts")
+    ingest.add_argument('--input', help="Directory containing PDF filings (default: synthetic filings)")
+    ingest.add_argument('--workers', nargs='+', type=int, default=[1, 4, 8],
+                        help="Worker counts; the first is the baseline for speedup")
+    ingest.add_argument('--pages-per-task', type=int, default=Config.INGEST_PAGES_PER_TASK)
+    ingest.add_argument('--files', type=int, default=5, help="Synthetic filings to generate")
+    ingest.add_argument('--pages', type=int, default=120, help="Pages per synthetic filing")
+    ingest.set_defaults(func=bench_ingest)
+
+    routing = subparsers.add_parser('routing', help="Summarize model routing calls per section and tier")
+    routing.add_argument('--log', default=Config.ROUTING_LOG_PATH)
+    routing.set_defaults(func=bench_routing)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    results = args.func(args)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
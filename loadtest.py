@@ -0,0 +1,373 @@
+"""
+Offline load test for the web endpoints.
+
+Starts serve.py in a scratch directory with the "echo" LLM backend and mock
+embeddings, then uploads small synthetic filings at increasing concurrency and
+downloads their summaries. Every filing carries a unique marker that the echo
+backend copies into the summaries; a response that misses its own marker or
+contains another request's marker fails the run.
+
+Records throughput, p50/p95/p99 latency per endpoint, error rates and the peak
+RSS of every server process, and writes them to a JSON report.
+
+Usage:
+    python loadtest.py [--concurrency 1 2 4 8] [--requests 0] [--report loadtest_report.json]
+"""
+import os
+import re
+import sys
+import math
+import socket
+import json
+import time
+import uuid
+import signal
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import io
+import zipfile
+import http.client
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import _print_table, _wait_for
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+MARKER_PATTERN = re.compile(r'LOADTEST_[0-9a-f]{32}')
+SUMMARIES = ('one_page_summary', 'two_page_summary')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _synthetic_filing(marker, pages):
+    """A small text PDF whose every paragraph names the marker, so every chunk carries it"""
+    from app.services.report_renderer import render_pdf
+
+    paragraph = (f"Filing {marker}: revenue grew 8.1% year over year to $94.8 billion, driven by "
+                 "Services ($20.9 billion, +5.5%) while Greater China declined 2.9%. ")
+    content = {f"Item {page}": paragraph * 8 for page in range(1, pages + 1)}
+    return render_pdf(content, "January 01, 2025")
+
+
+def _multipart(field, files):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for filename, data in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                   f'filename="{filename}"\r\nContent-Type: application/pdf\r\n\r\n'.encode('latin-1'))
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('latin-1'))
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def _http(url, data=None, content_type=None, timeout=600):
+    """Returns (status, body, seconds); status is None when the connection failed"""
+    request = urllib.request.Request(url, data=data, method='POST' if data is not None else 'GET')
+    if content_type:
+        request.add_header('Content-Type', content_type)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), time.perf_counter() - started
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(), time.perf_counter() - started
+    except (OSError, http.client.HTTPException):
+        return None, b'', time.perf_counter() - started
+
+
+def _document_text(fmt, body):
+    if fmt == 'docx':
+        with zipfile.ZipFile(io.BytesIO(body)) as docx:
+            return docx.read('word/document.xml').decode('utf-8')
+    # The PDF renderer writes uncompressed text streams
+    return body.decode('latin-1')
+
+
+def _check_output(text, marker):
+    """'mixed' if the text names another request's marker, 'missing' if it lacks its own, else None"""
+    found = set(MARKER_PATTERN.findall(text))
+    if found - {marker}:
+        return 'mixed'
+    if marker not in found:
+        return 'missing'
+    return None
+
+
+class Job:
+    """One simulated user: upload a filing, poll its status, download its summaries"""
+
+    def __init__(self, base_url, pages, formats, evaluate):
+        self.base_url = base_url
+        self.pages = pages
+        self.formats = formats
+        self.evaluate = evaluate
+        self.marker = f"LOADTEST_{uuid.uuid4().hex}"
+        # (endpoint, seconds, ok) per HTTP request
+        self.calls = []
+        # Outputs holding another job's marker, and outputs lacking this job's marker
+        self.mixed = []
+        self.missing = []
+
+    def _call(self, endpoint, url, data=None, content_type=None):
+        status, body, seconds = _http(url, data, content_type)
+        self.calls.append((endpoint, seconds, status == 200))
+        return status, body
+
+    def _check(self, name, text):
+        problem = _check_output(text, self.marker)
+        if problem == 'mixed':
+            self.mixed.append(name)
+        elif problem == 'missing':
+            self.missing.append(name)
+
+    def run(self):
+        data, content_type = _multipart('files', [('filing.pdf', _synthetic_filing(self.marker, self.pages))])
+        status, body = self._call('upload', self.base_url + '/', data, content_type)
+        try:
+            result = json.loads(body)
+        except ValueError:
+            result = {}
+        if status != 200 or not result.get('success'):
+            # Failed uploads are already counted as errors
+            if status == 200:
+                self.calls[-1] = ('upload', self.calls[-1][1], False)
+            return self
+
+        job_id = result['job_id']
+        self._check('preview', result.get('preview', ''))
+
+        status, body = self._call('status', f"{self.base_url}/status/{job_id}")
+        if status == 200 and json.loads(body).get('stage') != 'done':
+            self.missing.append('status')
+
+        for name in SUMMARIES:
+            for fmt in self.formats:
+                status, body = self._call('download', f"{self.base_url}/download/{job_id}/{name}.{fmt}")
+                if status == 200:
+                    self._check(f"{name}.{fmt}", _document_text(fmt, body))
+
+        if self.evaluate:
+            self._call('evaluate', f"{self.base_url}/evaluate/{job_id}")
+        return self
+
+
+def _proc_tree(root_pid):
+    """root_pid and all its descendants, from /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # The command name may contain spaces; the ppid follows the closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class MemorySampler(threading.Thread):
+    """Samples the RSS of the server's process tree and keeps the peaks"""
+
+    def __init__(self, root_pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_per_process = {}
+        self.peak_total = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            total = 0.0
+            for pid in _proc_tree(self.root_pid):
+                rss = _rss_mb(pid)
+                total += rss
+                self.peak_per_process[pid] = max(self.peak_per_process.get(pid, 0.0), rss)
+            self.peak_total = max(self.peak_total, total)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def run_level(base_url, server_pid, concurrency, requests, args):
+    """Run `requests` jobs with `concurrency` in flight and summarize them"""
+    sampler = MemorySampler(server_pid)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        jobs = list(pool.map(lambda _: Job(base_url, args.pages, args.formats, args.evaluate).run(),
+                             range(requests)))
+    wall = time.perf_counter() - started
+    sampler.stop()
+
+    calls = [call for job in jobs for call in job.calls]
+    endpoints = {}
+    for endpoint in sorted({endpoint for endpoint, _, _ in calls}):
+        seconds = [s for e, s, _ in calls if e == endpoint]
+        errors = sum(1 for e, _, ok in calls if e == endpoint and not ok)
+        endpoints[endpoint] = {
+            'requests': len(seconds),
+            'errors': errors,
+            'error_rate': round(errors / len(seconds), 4),
+            'p50_seconds': round(_percentile(seconds, 50), 3),
+            'p95_seconds': round(_percentile(seconds, 95), 3),
+            'p99_seconds': round(_percentile(seconds, 99), 3),
+            'max_seconds': round(max(seconds), 3)
+        }
+
+    errors = sum(1 for _, _, ok in calls if not ok)
+    completed = sum(1 for job in jobs if job.calls and job.calls[0][2])
+    return {
+        'concurrency': concurrency,
+        'jobs': requests,
+        'jobs_completed': completed,
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(completed / wall, 3),
+        'requests_per_second': round(len(calls) / wall, 2),
+        'requests': len(calls),
+        'errors': errors,
+        'error_rate': round(errors / len(calls), 4) if calls else 0.0,
+        'mixed_outputs': sum(len(job.mixed) for job in jobs),
+        'mixed_details': sorted({item for job in jobs for item in job.mixed}),
+        'missing_outputs': sum(len(job.missing) for job in jobs),
+        'missing_details': sorted({item for job in jobs for item in job.missing}),
+        'endpoints': endpoints,
+        'peak_rss_mb': round(sampler.peak_total, 1),
+        'peak_rss_mb_per_process': {str(pid): round(rss, 1) for pid, rss in sampler.peak_per_process.items()}
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=0,
+                        help="Jobs per concurrency level (default: twice the concurrency)")
+    parser.add_argument('--pages', type=int, default=3, help="Pages per synthetic filing")
+    parser.add_argument('--formats', nargs='+', default=['docx', 'md'], choices=['docx', 'md', 'html', 'pdf'])
+    parser.add_argument('--evaluate', action='store_true', help="Also call /evaluate (needs a real judge LLM)")
+    parser.add_argument('--workers', type=int, default=2, help="Server workers (WEB_WORKERS)")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per server worker (WEB_THREADS)")
+    parser.add_argument('--ingest-workers', type=int, default=1, help="PDF extraction processes per worker")
+    parser.add_argument('--llm-delay', type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--max-error-rate', type=float, help="Also fail when a level's error rate exceeds this")
+    parser.add_argument('--report', default='loadtest_report.json')
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch directory and server log")
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='loadtest_')
+    port = _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(
+        os.environ,
+        LLM_BACKEND='echo',
+        LLM_ECHO_DELAY=str(args.llm_delay),
+        EMBEDDING_MODEL='mock',
+        WEB_BIND=f'127.0.0.1:{port}',
+        WEB_WORKERS=str(args.workers),
+        WEB_THREADS=str(args.threads),
+        INGEST_WORKERS=str(args.ingest_workers)
+    )
+
+    # The server runs in the scratch directory, so its instance/ uploads, outputs and caches start empty
+    log_path = os.path.join(scratch_dir, 'server.log')
+    with open(log_path, 'wb') as log:
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'serve.py')], cwd=scratch_dir,
+                                  env=env, start_new_session=True, stdout=log, stderr=subprocess.STDOUT)
+
+    levels = []
+    try:
+        if _wait_for(f'{base_url}/ready', time.time() + args.startup_timeout) is None:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                sys.exit(f"Server did not become ready:\n{f.read()[-3000:]}")
+
+        for concurrency in args.concurrency:
+            requests = args.requests or concurrency * 2
+            print(f"concurrency {concurrency}: {requests} jobs", flush=True)
+            levels.append(run_level(base_url, server.pid, concurrency, requests, args))
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+        if not args.keep:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    _print_table(levels, ['concurrency', 'jobs_per_second', 'error_rate', 'mixed_outputs',
+                          'missing_outputs', 'peak_rss_mb'])
+    for level in levels:
+        rows = [dict(endpoint=name, **stats) for name, stats in level['endpoints'].items()]
+        print(f"\nconcurrency {level['concurrency']}")
+        _print_table(rows, ['endpoint', 'requests', 'error_rate', 'p50_seconds', 'p95_seconds', 'p99_seconds'])
+
+    failures = [f"concurrency {level['concurrency']}: {level['mixed_outputs']} mixed and "
+                f"{level['missing_outputs']} missing outputs"
+                for level in levels if level['mixed_outputs'] or level['missing_outputs']]
+    if args.max_error_rate is not None:
+        failures += [f"concurrency {level['concurrency']}: error rate {level['error_rate']}"
+                     for level in levels if level['error_rate'] > args.max_error_rate]
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('report', 'keep')},
+        'cpu_count': os.cpu_count(),
+        'levels': levels,
+        'passed': not failures,
+        'failures': failures
+    }
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {args.report}")
+
+    if failures:
+        print('\n'.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
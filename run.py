@@ -1,6 +1,15 @@
-from app import create_app
+import os
+
+# Development server: allow per-job profiling (X-Profile: 1 or ?profile=1)
+os.environ.setdefault('ALLOW_PROFILING', '1')
 
-app = create_app()
+from app import create_app
+from app.config import Config
 
 if __name__ == '__main__':
+    # Created only when run as a script: spawned PDF extraction workers re-import this
+    # module as __mp_main__. With the reloader, the first process only watches files
+    # and restarts the server process (WERKZEUG_RUN_MAIN=true), which does the warm-up
+    app = create_app(warmup_in_background=Config.WARMUP_IN_BACKGROUND
+                     and os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
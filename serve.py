@@ -0,0 +1,53 @@
+"""
+Production entry point: gunicorn with preloaded models and multiple workers.
+
+The master process imports the heavy libraries and loads the embedding model
+once, then forks WEB_WORKERS workers (each with WEB_THREADS threads) that share
+that memory copy-on-write. Each worker warms up in the background; GET /ready
+returns 503 until it is done. Use run.py for local development.
+"""
+import time
+
+PROCESS_STARTED_AT = time.time()
+
+from gunicorn.app.base import BaseApplication  # noqa: E402
+from app import create_app, warmup  # noqa: E402
+from app.config import Config  # noqa: E402
+
+
+def post_fork(server, worker):
+    warmup.start_worker_warmup()
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        warmup.mark_process_start(PROCESS_STARTED_AT)
+        if Config.WEB_PRELOAD:
+            # Runs in the master; workers warm up after fork (post_fork)
+            warmup.preload()
+            return create_app(warmup_in_background=False)
+        # Runs in each worker, which loads the heavy libraries in the background
+        return create_app(warmup_in_background=True)
+
+
+if __name__ == '__main__':
+    options = {
+        'bind': Config.WEB_BIND,
+        'workers': Config.WEB_WORKERS,
+        'threads': Config.WEB_THREADS,
+        'worker_class': 'gthread',
+        'timeout': Config.WEB_TIMEOUT,
+        'preload_app': Config.WEB_PRELOAD,
+        'accesslog': '-'
+    }
+    if Config.WEB_PRELOAD:
+        options['post_fork'] = post_fork
+    ProductionServer(options).run()
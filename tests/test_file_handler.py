@@ -0,0 +1,90 @@
+"""Streaming multipart uploads: validation, size limits, deduplication and cleanup."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from app.utils.file_handler import FileHandler
+
+BOUNDARY = b"testboundary"
+
+
+def _body(*files, close=True):
+    """multipart/form-data body with one part per (filename, content) pair"""
+    parts = []
+    for filename, content in files:
+        parts.append(b"--" + BOUNDARY + b"\r\n"
+                     b'Content-Disposition: form-data; name="files"; filename="' + filename.encode() + b'"\r\n'
+                     b"Content-Type: application/pdf\r\n\r\n" + content + b"\r\n")
+    body = b"".join(parts)
+    if close:
+        body += b"--" + BOUNDARY + b"--\r\n"
+    return body
+
+
+def _pdf(marker: bytes, size: int = 4000) -> bytes:
+    content = b"%PDF-1.4\n" + marker
+    return content + b"x" * (size - len(content))
+
+
+def _files(folder):
+    return sorted(os.listdir(folder))
+
+
+def test_magic_split_across_chunks(tmp_path):
+    # Chunks of 3 bytes split "%PDF-" between reads
+    handler = FileHandler(str(tmp_path), max_file_size=10_000, chunk_size=3)
+    saved = handler.save_streamed_files(io.BytesIO(_body(("report.pdf", _pdf(b"a")))), BOUNDARY)
+
+    assert len(saved) == 1
+    with open(saved[0].path, "rb") as f:
+        assert f.read() == _pdf(b"a")
+
+
+def test_sha256_matches_whole_file(tmp_path):
+    content = _pdf(b"hash", size=300_000)
+    handler = FileHandler(str(tmp_path), max_file_size=1_000_000, chunk_size=4096)
+    saved = handler.save_streamed_files(io.BytesIO(_body(("report.pdf", content))), BOUNDARY)
+
+    assert saved[0].sha256 == hashlib.sha256(content).hexdigest()
+    assert saved[0].size == len(content)
+
+
+def test_oversized_file_rejected_mid_stream(tmp_path):
+    handler = FileHandler(str(tmp_path), max_file_size=10_000, chunk_size=1024)
+    body = _body(("big.pdf", _pdf(b"big", size=50_000)), ("small.pdf", _pdf(b"small")))
+    saved = handler.save_streamed_files(io.BytesIO(body), BOUNDARY)
+
+    assert [os.path.basename(record.path).split("_")[0] for record in saved] == ["small"]
+    # The partial temp file of the rejected upload is gone
+    assert _files(tmp_path) == [os.path.basename(saved[0].path)]
+
+
+def test_non_pdf_rejected(tmp_path):
+    handler = FileHandler(str(tmp_path), max_file_size=10_000, chunk_size=1024)
+    body = _body(("fake.pdf", b"MZ\x90\x00" + b"x" * 2000), ("script.sh", _pdf(b"sh")))
+    saved = handler.save_streamed_files(io.BytesIO(body), BOUNDARY)
+
+    assert saved == []
+    assert _files(tmp_path) == []
+
+
+def test_duplicate_content_saved_once(tmp_path):
+    handler = FileHandler(str(tmp_path), max_file_size=10_000, chunk_size=1024)
+    body = _body(("q1.pdf", _pdf(b"same")), ("q1_copy.pdf", _pdf(b"same")))
+    saved = handler.save_streamed_files(io.BytesIO(body), BOUNDARY)
+
+    assert len(saved) == 1
+    assert _files(tmp_path) == [os.path.basename(saved[0].path)]
+
+
+def test_truncated_body_removes_saved_files(tmp_path):
+    handler = FileHandler(str(tmp_path), max_file_size=100_000, chunk_size=1024)
+    body = _body(("first.pdf", _pdf(b"one")), ("second.pdf", _pdf(b"two", size=20_000)), close=False)
+    # Cut the body off in the middle of the second file
+    truncated = body[:len(body) - 10_000]
+
+    with pytest.raises(ValueError):
+        handler.save_streamed_files(io.BytesIO(truncated), BOUNDARY)
+    assert _files(tmp_path) == []
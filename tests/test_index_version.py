@@ -0,0 +1,39 @@
+"""The same filing uploaded in two jobs must embed identically, so cached retrievals carry over."""
+import hashlib
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+pytest.importorskip("llama_index.vector_stores.faiss")
+
+from app.services.document_ingester import DocumentIngester  # noqa: E402
+from app.services.embeddings import MOCK_EMBEDDING_MODEL  # noqa: E402
+from app.services.report_renderer import render_pdf  # noqa: E402
+
+
+def _ingest(job_dir, pdf, file_name):
+    upload_dir = job_dir / "uploads"
+    upload_dir.mkdir(parents=True)
+    (upload_dir / file_name).write_bytes(pdf)
+
+    ingester = DocumentIngester(
+        str(upload_dir),
+        str(job_dir / "vector_store"),
+        embedding_model=MOCK_EMBEDDING_MODEL,
+        file_hashes={file_name: hashlib.sha256(pdf).hexdigest()},
+        index_type="flat",
+        workers=1
+    )
+    ingester.create_index()
+    return ingester.index_version
+
+
+def test_same_filing_in_two_jobs_has_same_index_version(tmp_path):
+    pdf = render_pdf({"Results": "Revenue grew 8.1% to $94.8 billion. " * 80}, "January 01, 2025")
+
+    # Uploads are saved as <name>_<timestamp>.pdf in the job's own directory
+    first = _ingest(tmp_path / "job1", pdf, "filing_20250101120000.pdf")
+    second = _ingest(tmp_path / "job2", pdf, "filing_20250102093000.pdf")
+
+    assert first is not None
+    assert first == second
@@ -0,0 +1,30 @@
+"""App startup must not import the heavy ML stack; it loads on first use or in the warm-up thread."""
+import os
+import json
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('torch', 'transformers', 'llama_index', 'faiss', 'langchain', 'langchain_core',
+                 'ragas', 'datasets', 'pandas', 'docx')
+
+STARTUP_SCRIPT = """
+import sys, json
+from app import create_app
+client = create_app().test_client()
+client.get('/')
+client.get('/ready')
+print(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))
+"""
+
+
+def test_create_app_imports_no_heavy_modules(tmp_path):
+    env = dict(os.environ, WARMUP_IN_BACKGROUND='0', PYTHONPATH=ROOT)
+    # Run in a scratch directory so instance/ and app.log are not written into the checkout
+    completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=tmp_path, env=env,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    loaded = set(json.loads(completed.stdout.strip().splitlines()[-1]))
+    assert not loaded & set(HEAVY_MODULES), f"heavy modules imported at startup: {sorted(loaded & set(HEAVY_MODULES))}"